@@ -0,0 +1,166 @@
+"""
+A local stand-in for the OpenAI API used by the benchmarks.
+
+Serves chat completions and Whisper transcriptions with configurable latency and
+error rate, and counts every call so benchmarks can report API usage.
+
+Run standalone with:
+    python -m benchmarks.fake_openai --port 8765 --latency 0.5 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+# Whisper input is extracted as 32 kbps MP3, which lets transcripts span the audio duration
+AUDIO_BYTES_PER_SECOND = 32000 / 8
+WORDS_PER_SECOND = 2.5
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.5,
+                 jitter: float = 0.2, error_rate: float = 0.0, seed: int = 0):
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.errors = Counter()
+        self.bytes_received = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+            self.bytes_received.clear()
+
+    def counters(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "rate_limited": dict(self.errors),
+                "bytes_received": dict(self.bytes_received)
+            }
+
+    def record(self, endpoint: str, size: int) -> bool:
+        """Counts a call and decides whether it should fail with a 429."""
+        with self._lock:
+            self.calls[endpoint] += 1
+            self.bytes_received[endpoint] += size
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors[endpoint] += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        return failed
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    server: FakeOpenAIServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        size = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(size)
+
+        if self.path.endswith("/chat/completions"):
+            endpoint = "chat.completions"
+        elif self.path.endswith("/audio/transcriptions"):
+            endpoint = "audio.transcriptions"
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown endpoint {self.path}"}})
+            return
+
+        if self.server.record(endpoint, size):
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                            headers={"retry-after-ms": "50"})
+            return
+
+        if endpoint == "chat.completions":
+            self._send_json(200, chat_completion(json.loads(body or b"{}")))
+        else:
+            self._send_json(200, transcription(size))
+
+def chat_completion(request: Dict[str, Any]) -> Dict[str, Any]:
+    content = request.get("messages", [{}])[-1].get("content", "")
+    prompt_chars = len(json.dumps(content))
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "gpt-4o"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": f"Fake summary of a {prompt_chars} character request."},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": 12, "total_tokens": prompt_chars // 4 + 12}
+    }
+
+def transcription(upload_size: int) -> Dict[str, Any]:
+    duration = upload_size / AUDIO_BYTES_PER_SECOND
+    count = int(duration * WORDS_PER_SECOND)
+    words = [
+        {"word": f"word{i}", "start": i / WORDS_PER_SECOND, "end": (i + 0.8) / WORDS_PER_SECOND}
+        for i in range(count)
+    ]
+    return {
+        "task": "transcribe",
+        "language": "english",
+        "duration": duration,
+        "text": " ".join(w["word"] for w in words),
+        "words": words,
+        "segments": []
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.2, help="uniform +/- seconds around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.jitter, args.error_rate)
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
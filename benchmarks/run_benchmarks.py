@@ -0,0 +1,283 @@
+"""
+Offline benchmarks for the video-to-workflow pipeline.
+
+Generates synthetic screen recordings, points the OpenAI clients at a local fake
+server and runs every pipeline stage end to end, recording per-stage wall time,
+ffmpeg process count, peak RSS and API call counts.
+
+Run from the repository root:
+    python -m benchmarks.run_benchmarks --durations 60,300 --screen-seconds 5,20 \
+        --latency 0.5 --error-rate 0.02 --output bench_results.json
+
+Compare two result files by passing the older one with --baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+VIDEO_SIZE = (1280, 720)
+RSS_SAMPLE_INTERVAL = 0.02
+
+class ProcessCounter:
+    """Counts subprocesses spawned through subprocess.Popen, grouped by executable."""
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self._original = None
+
+    def install(self) -> None:
+        self._original = subprocess.Popen
+        counter = self
+
+        class CountingPopen(self._original):
+            def __init__(self, args, *a, **kw):
+                name = os.path.basename(args[0] if isinstance(args, (list, tuple)) else str(args).split()[0])
+                counter.counts[name] = counter.counts.get(name, 0) + 1
+                super().__init__(args, *a, **kw)
+
+        subprocess.Popen = CountingPopen
+
+    def uninstall(self) -> None:
+        subprocess.Popen = self._original
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process, read from /proc when available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if platform.system() == "Darwin" else maxrss * 1024
+
+class RSSSampler:
+    """Samples the process RSS on a background thread to find the peak during a stage."""
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self) -> "RSSSampler":
+        self.peak = current_rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+def make_screen(rng: np.random.Generator, index: int) -> np.ndarray:
+    """Draws a synthetic UI screen: a light page with a header bar and a few coloured panels."""
+    width, height = VIDEO_SIZE
+    screen = np.full((height, width, 3), 245, dtype=np.uint8)
+    screen[:60] = rng.integers(0, 255, 3, dtype=np.uint8)
+    for _ in range(6):
+        x, y = rng.integers(0, width - 200), rng.integers(80, height - 120)
+        w, h = rng.integers(100, 400), rng.integers(40, 200)
+        screen[y:y + h, x:x + w] = rng.integers(0, 255, 3, dtype=np.uint8)
+    # Fake lines of text so frames are not trivially compressible
+    for row in range(100 + (index % 5) * 10, height - 40, 24):
+        length = int(rng.integers(200, width - 100))
+        screen[row:row + 8, 40:40 + length] = 60
+    return screen
+
+def generate_video(path: Path, duration: int, screen_seconds: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Renders a synthetic recording that switches to a new screen every screen_seconds,
+    with a tone on the audio track.
+    """
+    rng = np.random.default_rng(seed)
+    screen_count = max(1, -(-duration // screen_seconds))
+    with tempfile.TemporaryDirectory(prefix="bench_screens_") as screens_dir:
+        work_dir = Path(screens_dir)
+        concat_lines = []
+        for i in range(screen_count):
+            screen_path = work_dir / f"screen{i:04d}.png"
+            Image.fromarray(make_screen(rng, i)).save(screen_path)
+            concat_lines.append(f"file '{screen_path}'\nduration {min(screen_seconds, duration - i * screen_seconds)}")
+        # The concat demuxer needs the last file repeated for its duration to apply
+        concat_lines.append(f"file '{work_dir / f'screen{screen_count - 1:04d}.png'}'")
+        concat_file = work_dir / "screens.txt"
+        concat_file.write_text("\n".join(concat_lines))
+
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", str(concat_file),
+            "-f", "lavfi", "-i", f"sine=frequency=300:duration={duration}",
+            "-vf", "fps=10,format=yuv420p", "-c:v", "libx264", "-preset", "ultrafast",
+            "-c:a", "aac", "-t", str(duration), str(path)
+        ], check=True)
+    return {"duration": duration, "screen_seconds": screen_seconds, "screens": screen_count}
+
+@contextmanager
+def stage(results: Dict[str, Any], name: str, processes: ProcessCounter, server: FakeOpenAIServer) -> Iterator[None]:
+    before_processes = processes.snapshot()
+    before_calls = server.counters()["calls"]
+    start = time.perf_counter()
+    with RSSSampler() as sampler:
+        yield
+    after_calls = server.counters()["calls"]
+    after_processes = processes.snapshot()
+    results[name] = {
+        "wall_time": round(time.perf_counter() - start, 4),
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1),
+        "processes": {k: v - before_processes.get(k, 0) for k, v in after_processes.items() if v != before_processes.get(k, 0)},
+        "api_calls": {k: v - before_calls.get(k, 0) for k, v in after_calls.items() if v != before_calls.get(k, 0)}
+    }
+
+def run_pipeline(video_path: Path, server: FakeOpenAIServer, processes: ProcessCounter) -> Dict[str, Any]:
+    """Runs each pipeline stage in order, the same way build_workflow in main.py does."""
+    from controllers.video_controller import (
+        extract_media, group_images, transcribe_audio, align_transcription, combine_workflow_data
+    )
+
+    stages: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        audio_path = os.path.join(temp_dir, "audio.mp3")
+        screenshots_dir = os.path.join(temp_dir, "screenshots")
+
+        with stage(stages, "extract_media", processes, server):
+            media = extract_media(str(video_path), screenshots_dir, audio_path)
+
+        frames = media["frames"]
+        with stage(stages, "group_images", processes, server):
+            screenshot_info = group_images(list(frames), timestamps=frames, duration=media["duration"])
+
+        with stage(stages, "transcribe_audio", processes, server):
+            words = transcribe_audio(audio_path)
+
+        with stage(stages, "align_transcription", processes, server):
+            transcriptions = align_transcription(words, screenshot_info)
+
+        with stage(stages, "combine_workflow_data", processes, server):
+            combined = combine_workflow_data(screenshot_info, transcriptions)
+
+    return {
+        "stages": stages,
+        "frames": len(frames),
+        "detected_screens": len(screenshot_info),
+        "workflow_steps": len(combined)
+    }
+
+def summarize(run: Dict[str, Any], server_counters: Dict[str, Any]) -> Dict[str, Any]:
+    stages = run["stages"].values()
+    processes: Dict[str, int] = {}
+    for s in stages:
+        for name, count in s["processes"].items():
+            processes[name] = processes.get(name, 0) + count
+    return {
+        "wall_time": round(sum(s["wall_time"] for s in stages), 4),
+        "peak_rss_mb": max(s["peak_rss_mb"] for s in stages),
+        "processes": processes,
+        **server_counters
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Prints the total wall time change for every scenario present in both result files."""
+    previous = {s["name"]: s for s in baseline.get("scenarios", [])}
+    print(f"\n--- Compared with {baseline.get('commit', 'unknown')[:10]} ---")
+    for scenario in current["scenarios"]:
+        old = previous.get(scenario["name"])
+        if old is None:
+            continue
+        before, after = old["totals"]["wall_time"], scenario["totals"]["wall_time"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{scenario['name']}: {before:.2f}s -> {after:.2f}s ({change:+.1f}%)")
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=parse_int_list, default=[60, 300], help="video lengths in seconds")
+    parser.add_argument("--screen-seconds", type=parse_int_list, default=[5, 20], help="seconds between screen changes")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake API mean latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="fake API latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake API calls answered with 429")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--keep-cache", action="store_true", help="reuse the result cache between scenarios")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).start()
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_"))
+
+    # The controllers build their OpenAI clients and open the cache at import time / first use
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["PEAR_CACHE_PATH"] = str(work_dir / "cache.sqlite3")
+    import core.cache
+
+    processes = ProcessCounter()
+    processes.install()
+    scenarios = []
+    try:
+        for duration in args.durations:
+            for screen_seconds in args.screen_seconds:
+                name = f"{duration}s-every-{screen_seconds}s"
+                video_path = work_dir / f"{name}.mp4"
+                print(f"\n--- Scenario {name} ---")
+                video_info = generate_video(video_path, duration, screen_seconds)
+
+                if not args.keep_cache:
+                    core.cache._cache = core.cache.ResultCache(str(work_dir / f"{name}.sqlite3"))
+                server.reset_counters()
+
+                run = run_pipeline(video_path, server, processes)
+                totals = summarize(run, server.counters())
+                totals["cache"] = core.cache.get_cache().stats()
+                # Largest RSS of any finished child process so far (ffmpeg), in kilobytes on Linux
+                totals["children_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+
+                scenarios.append({"name": name, "video": video_info, **run, "totals": totals})
+                print(json.dumps(totals, indent=2))
+    finally:
+        processes.uninstall()
+        server.stop()
+
+    results = {
+        "commit": git_commit(),
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "fake_api": {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate},
+        "scenarios": scenarios
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote benchmark results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from core.cache import get_cache, cache_key, hash_bytes
+
+# Replay the recorded browser actions of an earlier successful run instead of asking the LLM again
+ACTION_REPLAY_ENABLED = os.getenv("PEAR_ACTION_REPLAY", "1") == "1"
+# How long to wait for the page to finish loading after each replayed action
+REPLAY_PAGE_TIMEOUT = float(os.getenv("PEAR_REPLAY_PAGE_TIMEOUT", 10))
+REPLAY_POLL_INTERVAL = 0.1
+
+# SeleniumDriver methods LaVague drives the browser through, and how many positional
+# arguments of each are kept (exec_code's globals/locals are rebuilt by the driver)
+RECORDED_METHODS = {"get": 1, "exec_code": 1, "back": 0, "scroll_up": 0, "scroll_down": 0}
+
+def normalize_url(url: str) -> str:
+    """Lowercases the scheme and host and drops the fragment and a trailing slash."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+def normalize_trace(trace: str) -> str:
+    """Canonical JSON for JSON traces (key order and whitespace do not matter); collapsed whitespace otherwise."""
+    try:
+        return json.dumps(json.loads(trace), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return " ".join(trace.split())
+
+def replay_key(trace: str, hint: str, url: str) -> str:
+    normalized = json.dumps([normalize_trace(trace), " ".join(hint.split()).lower(), normalize_url(url)])
+    return cache_key(hash_bytes(normalized.encode("utf-8")), "action-replay", "")
+
+def get_recording(key: str) -> Optional[List[Dict[str, Any]]]:
+    return get_cache().get(key)
+
+def save_recording(key: str, actions: List[Dict[str, Any]], lavague_prompt: str = None) -> None:
+    """Stores a run's actions, and the prompt it ran with so a later fallback need not rebuild it."""
+    get_cache().set(key, actions)
+    if lavague_prompt is not None:
+        get_cache().set(_prompt_key(key), lavague_prompt)
+
+def get_recorded_prompt(key: str) -> Optional[str]:
+    return get_cache().get(_prompt_key(key))
+
+def _prompt_key(key: str) -> str:
+    return cache_key(key, "action-replay-prompt", "")
+
+class ActionRecorder:
+    """
+    Records the browser actions LaVague performs on a driver while the block runs.
+
+    The driver's action methods are wrapped on the instance, so the agent and its
+    action engine go through the recorder without knowing about it. Only top-level
+    calls are recorded (a navigation made from inside exec_code is part of that action).
+    """
+    def __init__(self, driver: Any):
+        self.driver = driver
+        self.actions: List[Dict[str, Any]] = []
+        self._depth = 0
+        self._wrapped: List[str] = []
+
+    def _wrap(self, name: str, keep_args: int) -> None:
+        original = getattr(self.driver, name)
+
+        def recorded(*args, **kwargs):
+            top_level = self._depth == 0
+            self._depth += 1
+            try:
+                result = original(*args, **kwargs)
+            finally:
+                self._depth -= 1
+            if top_level:
+                self.actions.append({"method": name, "args": list(args[:keep_args])})
+            return result
+
+        setattr(self.driver, name, recorded)
+        self._wrapped.append(name)
+
+    def __enter__(self) -> "ActionRecorder":
+        for name, keep_args in RECORDED_METHODS.items():
+            if callable(getattr(self.driver, name, None)):
+                self._wrap(name, keep_args)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for name in self._wrapped:
+            # Drop the instance attribute so the class method shows through again
+            self.driver.__dict__.pop(name, None)
+        self._wrapped = []
+
+def wait_for_page(driver: Any, timeout: float = REPLAY_PAGE_TIMEOUT) -> None:
+    """Waits until the current document has finished loading."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if driver.get_driver().execute_script("return document.readyState") == "complete":
+                return
+        except Exception:
+            pass
+        time.sleep(REPLAY_POLL_INTERVAL)
+
+def replay_actions(driver: Any, actions: List[Dict[str, Any]]) -> int:
+    """
+    Replays recorded actions on the driver in order, stopping at the first one that fails.
+
+    Returns how many actions completed; equal to len(actions) when the replay succeeded.
+    """
+    for index, action in enumerate(actions):
+        try:
+            getattr(driver, action["method"])(*action["args"])
+            wait_for_page(driver)
+        except Exception as e:
+            print(f"Replay stopped at action {index + 1} of {len(actions)} ({action['method']}): {str(e)}")
+            return index
+    return len(actions)
@@ -0,0 +1,199 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    # LaVague (and Selenium behind it) is slow to import, so it is loaded when the first browser launches
+    from lavague.drivers.selenium import SeleniumDriver
+    from lavague.core import ActionEngine, WorldModel
+
+# Number of browsers kept warm, uses before a browser is replaced, and where their profiles live
+DRIVER_POOL_SIZE = int(os.getenv("PEAR_DRIVER_POOL_SIZE", 2))
+DRIVER_MAX_USES = int(os.getenv("PEAR_DRIVER_MAX_USES", 20))
+DRIVER_PROFILE_ROOT = os.getenv("PEAR_DRIVER_PROFILE_ROOT", ".cache/chrome_profiles")
+DRIVER_HEADLESS = os.getenv("PEAR_DRIVER_HEADLESS", "1") != "0"
+DRIVER_CHECKOUT_TIMEOUT = float(os.getenv("PEAR_DRIVER_CHECKOUT_TIMEOUT", 300))
+
+class DriverPoolTimeout(Exception):
+    """Raised when no browser becomes free within the checkout timeout."""
+
+class PooledDriver:
+    """
+    One slot in the pool: a browser with its own profile directory, plus the
+    LaVague engines built on top of it.
+    """
+    def __init__(self, slot: int, profile_dir: str):
+        self.slot = slot
+        self.profile_dir = profile_dir
+        self.driver: Optional["SeleniumDriver"] = None
+        self.action_engine: Optional["ActionEngine"] = None
+        self.world_model: Optional["WorldModel"] = None
+        self.uses = 0
+
+    @property
+    def launched(self) -> bool:
+        return self.driver is not None
+
+def quit_driver(driver: "SeleniumDriver") -> None:
+    """Shuts a browser down, ignoring errors from browsers that already crashed."""
+    try:
+        if hasattr(driver, "destroy"):
+            driver.destroy()
+        else:
+            driver.get_driver().quit()
+    except Exception as e:
+        print(f"Error while closing browser: {str(e)}")
+
+class DriverPool:
+    """
+    A fixed-size pool of pre-launched Selenium browsers for LaVague agents.
+
+    Each slot keeps its own profile directory across restarts, so concurrent runs never
+    share a Chrome profile. Browsers are health-checked on checkout and checkin, and
+    replaced after max_uses runs, after a failed run or when they stop responding.
+    """
+    def __init__(self, size: int = DRIVER_POOL_SIZE, max_uses: int = DRIVER_MAX_USES,
+                 profile_root: str = DRIVER_PROFILE_ROOT, headless: bool = DRIVER_HEADLESS,
+                 driver_factory: Callable[[str], "SeleniumDriver"] = None):
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.driver_factory = driver_factory or self._create_driver
+        self.slots: List[PooledDriver] = []
+        self._available: "queue.Queue[PooledDriver]" = queue.Queue()
+        self._closed = False
+
+        for slot in range(size):
+            profile_dir = os.path.abspath(os.path.join(profile_root, f"slot-{slot}"))
+            os.makedirs(profile_dir, exist_ok=True)
+            pooled = PooledDriver(slot, profile_dir)
+            self.slots.append(pooled)
+            self._available.put(pooled)
+
+    def _create_driver(self, profile_dir: str) -> "SeleniumDriver":
+        from lavague.drivers.selenium import SeleniumDriver
+        return SeleniumDriver(headless=self.headless, user_data_dir=profile_dir)
+
+    def _launch(self, pooled: PooledDriver) -> None:
+        from lavague.core import ActionEngine, WorldModel
+        print(f"Launching browser for pool slot {pooled.slot}")
+        pooled.driver = self.driver_factory(pooled.profile_dir)
+        pooled.action_engine = ActionEngine(pooled.driver)
+        pooled.world_model = WorldModel()
+        pooled.uses = 0
+
+    def _shutdown(self, pooled: PooledDriver) -> None:
+        if pooled.driver is not None:
+            quit_driver(pooled.driver)
+        pooled.driver = None
+        pooled.action_engine = None
+        pooled.world_model = None
+
+    def is_healthy(self, pooled: PooledDriver) -> bool:
+        """Checks that the browser is still alive and responding to commands."""
+        if pooled.driver is None:
+            return False
+        try:
+            return pooled.driver.get_driver().execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def warm(self) -> None:
+        """Launches a browser in every idle slot that does not have one yet."""
+        idle = []
+        while True:
+            try:
+                idle.append(self._available.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            for pooled in idle:
+                if not pooled.launched:
+                    self._launch(pooled)
+        finally:
+            for pooled in idle:
+                self._available.put(pooled)
+
+    def checkout(self, timeout: float = DRIVER_CHECKOUT_TIMEOUT) -> PooledDriver:
+        """
+        Takes a browser out of the pool, launching it first if needed. A browser that died
+        while idle is replaced before it is handed out.
+        """
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        try:
+            pooled = self._available.get(timeout=timeout)
+        except queue.Empty:
+            raise DriverPoolTimeout(f"No browser became available within {timeout}s")
+
+        try:
+            if pooled.launched and not self.is_healthy(pooled):
+                print(f"Browser in pool slot {pooled.slot} stopped responding while idle; relaunching")
+                self._shutdown(pooled)
+            if not pooled.launched:
+                self._launch(pooled)
+        except Exception:
+            self._available.put(pooled)
+            raise
+        pooled.uses += 1
+        return pooled
+
+    def checkin(self, pooled: PooledDriver, crashed: bool = False) -> None:
+        """Returns a browser to the pool, recycling it if it crashed, is unhealthy or is worn out."""
+        if self._closed:
+            self._shutdown(pooled)
+            return
+
+        if crashed or pooled.uses >= self.max_uses or not self.is_healthy(pooled):
+            print(f"Recycling browser in pool slot {pooled.slot} after {pooled.uses} uses")
+            self._shutdown(pooled)
+        else:
+            try:
+                pooled.driver.get("about:blank")
+            except Exception:
+                self._shutdown(pooled)
+        self._available.put(pooled)
+
+    @contextmanager
+    def driver(self, timeout: float = DRIVER_CHECKOUT_TIMEOUT) -> Iterator[PooledDriver]:
+        """Checks a browser out for the duration of a with block."""
+        pooled = self.checkout(timeout)
+        try:
+            yield pooled
+        except BaseException:
+            # The run may have left the browser in any state, so do not hand it out again
+            self.checkin(pooled, crashed=True)
+            raise
+        self.checkin(pooled)
+
+    def close(self) -> None:
+        self._closed = True
+        for pooled in self.slots:
+            self._shutdown(pooled)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "available": self._available.qsize(),
+            "launched": sum(1 for pooled in self.slots if pooled.launched),
+            "uses": {pooled.slot: pooled.uses for pooled in self.slots}
+        }
+
+_pool: Optional[DriverPool] = None
+_pool_lock = threading.Lock()
+
+def get_driver_pool() -> DriverPool:
+    """Returns the process-wide driver pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool()
+        return _pool
+
+def close_driver_pool() -> None:
+    """Shuts down the driver pool's browsers, if the pool was ever created."""
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
@@ -1,22 +1,91 @@
-from typing import Dict, Any
-from lavague.drivers.selenium import SeleniumDriver
-from lavague.core import ActionEngine, WorldModel
-from lavague.core.agents import WebAgent
-from openai import OpenAI
+from typing import Dict, Any, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
 import json
+import os
+import threading
+import time
+from controllers.action_replay import (ActionRecorder, ACTION_REPLAY_ENABLED, get_recording,
+                                       get_recorded_prompt, replay_actions, replay_key, save_recording)
+from controllers.driver_pool import get_driver_pool
+from core.cache import get_cache, cache_key, hash_bytes
+from core.metrics import span, record_llm_call, record_trace_compaction
+from core.debug import debug_dump
+from core.openai_client import get_openai_client, get_openai_limiter, retryable_errors, OPENAI_MAX_RETRIES
+from core.rate_limit import call_with_retries_sync
+from core.trace_compaction import compact_trace, TRACE_COMPACTION_ENABLED
 
-client = OpenAI()
+# Also keep deterministic (temperature 0) prompt results in the on-disk result cache
+PROMPT_CACHE_ENABLED = os.getenv("PEAR_PROMPT_CACHE", "0") == "1"
 
-def gpt_api_call(prompt: str) -> str:
-    """Make a call to the GPT API."""
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
-    return response.choices[0].message.content
+class LLMSession:
+    """
+    Memoizes LLM calls by (model, prompt, temperature) for the life of one request.
+
+    Concurrent callers asking for the same completion share a single in-flight API call.
+    """
+    def __init__(self, persistent_cache: bool = PROMPT_CACHE_ENABLED):
+        self.persistent_cache = persistent_cache
+        self.api_calls = 0
+        self._results: Dict[Tuple[str, str, float], Future] = {}
+        self._lock = threading.Lock()
+
+    def call(self, prompt: str, model: str = "gpt-4", temperature: float = 0) -> str:
+        key = (model, prompt, temperature)
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._complete(prompt, model, temperature)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+    def _complete(self, prompt: str, model: str, temperature: float) -> str:
+        use_cache = self.persistent_cache and temperature == 0
+        if use_cache:
+            persistent_key = cache_key(hash_bytes(prompt.encode("utf-8")), model, "", temperature=temperature)
+            cached = get_cache().get(persistent_key)
+            if cached is not None:
+                record_llm_call(model, "prompt", 0.0, status="cached")
+                return cached
 
-def generate_main_objective(trace: str, hint: str) -> str:
+        with self._lock:
+            self.api_calls += 1
+        retries = []
+        start = time.perf_counter()
+        try:
+            response = call_with_retries_sync(
+                get_openai_client().chat.completions.create,
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                retry_on=retryable_errors(),
+                max_retries=OPENAI_MAX_RETRIES,
+                limiter=get_openai_limiter(),
+                on_retry=lambda attempt, error: retries.append(attempt),
+            )
+        except Exception:
+            record_llm_call(model, "prompt", time.perf_counter() - start, status="error", retries=len(retries))
+            raise
+        record_llm_call(model, "prompt", time.perf_counter() - start, usage=response.usage, retries=len(retries))
+        result = response.choices[0].message.content
+        if use_cache:
+            get_cache().set(persistent_key, result)
+        return result
+
+def gpt_api_call(prompt: str, session: LLMSession = None) -> str:
+    """Make a call to the GPT API, memoized through the given session."""
+    return (session or LLMSession()).call(prompt)
+
+def generate_main_objective(trace: str, hint: str, session: LLMSession = None) -> str:
     """Generate the main objective based on the trace and hint."""
     prompt = (
         f"{trace}\n"
@@ -24,9 +93,9 @@ def generate_main_objective(trace: str, hint: str) -> str:
         "YOUR TASK IS TO GENERATE A COMPACT BUT DESCRIPTIVE MAIN OBJECTIVE OF THE ACTION "
         f"WHILE EMPHASIZING AND INCORPORATING THE HINT: {hint}."
     )
-    return gpt_api_call(prompt)
+    return gpt_api_call(prompt, session)
 
-def generate_context(trace: str, hint: str) -> str:
+def generate_context(trace: str, hint: str, session: LLMSession = None) -> str:
     """Generate the context based on the trace and hint."""
     prompt = (
         f"{trace}\n"
@@ -41,13 +110,32 @@ def generate_context(trace: str, hint: str) -> str:
         "DEVIATE AS NECESSARY.\n"
         "3. FINALLY, OUTPUT A CONCISE LIST OF ACTIONS TO TAKE TO ACHIEVE THIS MAIN OBJECTIVE."
     )
-    return gpt_api_call(prompt)
+    return gpt_api_call(prompt, session)
 
-def create_lavague_prompt(trace: str, hint: str) -> str:
-    """Create the final prompt for La Vague."""
-    main_objective = generate_main_objective(trace, hint)
-    context = generate_context(trace, hint)
-    
+def prepare_trace(trace: str) -> Tuple[str, Dict[str, int]]:
+    """
+    Compacts the trace to its token budget before it is pasted into the prompts, and
+    records the tokens saved for each of the two prompts that use it.
+    """
+    if not TRACE_COMPACTION_ENABLED:
+        return trace, {}
+    compacted, stats = compact_trace(trace)
+    record_trace_compaction(stats["original_tokens"], stats["compacted_tokens"], prompts=2)
+    print(f"Compacted trace from ~{stats['original_tokens']} to ~{stats['compacted_tokens']} tokens "
+          f"({stats['tokens_saved']} saved per prompt)")
+    return compacted, stats
+
+def generate_prompt_parts(trace: str, hint: str, session: LLMSession = None) -> Tuple[str, str]:
+    """Generate the main objective and the context concurrently."""
+    session = session or LLMSession()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Run in copies of the caller's context so LLM calls land in its timing breakdown
+        main_objective = executor.submit(contextvars.copy_context().run, generate_main_objective, trace, hint, session)
+        context = executor.submit(contextvars.copy_context().run, generate_context, trace, hint, session)
+        return main_objective.result(), context.result()
+
+def format_lavague_prompt(main_objective: str, context: str) -> str:
+    """Assemble the final La Vague prompt from its generated parts."""
     return (
         f"CONTEXT: {context}\n"
         f"OBJECTIVE: {main_objective}\n"
@@ -57,14 +145,24 @@ def create_lavague_prompt(trace: str, hint: str) -> str:
         "EXPLORATION IS ENCOURAGED WHERE NECESSARY. THINK STEP BY STEP."
     )
 
-def run_agent(url: str, lavague_prompt: str) -> Any:
-    """Run the La Vague agent with the given prompt."""
-    driver = SeleniumDriver(headless=False, user_data_dir = "/Users/rahulkumar/Library/Application Support/Google/Chrome/Profile 2")
-    action_engine = ActionEngine(driver)
-    world_model = WorldModel()
-    agent = WebAgent(world_model, action_engine)
-    
-    agent.get(url)
+def create_lavague_prompt(trace: str, hint: str, session: LLMSession = None) -> str:
+    """Create the final prompt for La Vague."""
+    trace, _ = prepare_trace(trace)
+    main_objective, context = generate_prompt_parts(trace, hint, session)
+    return format_lavague_prompt(main_objective, context)
+
+def run_agent(url: str, lavague_prompt: str, pooled=None, navigate: bool = True) -> Any:
+    """
+    Run the La Vague agent with the given prompt, on the given pooled browser or on a warm
+    one from the driver pool. With navigate=False the agent continues from the current page.
+    """
+    if pooled is None:
+        with get_driver_pool().driver() as pooled:
+            return run_agent(url, lavague_prompt, pooled, navigate)
+    from lavague.core.agents import WebAgent
+    agent = WebAgent(pooled.world_model, pooled.action_engine)
+    if navigate:
+        agent.get(url)
     return agent.run(lavague_prompt)
 
 def optimize_prompt(workflow_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -103,32 +201,14 @@ def run_lavague_workflow(trace: str, hint: str, url: str) -> Dict[str, Any]:
     }
 
     try:
-        # Step 1: Generate the main objective
-        print("Generating main objective...")
-        main_objective = generate_main_objective(trace, hint)
-        print(f"Main objective: {main_objective}")
-        workflow_result["main_objective"] = main_objective
-
-        # Step 2: Generate the context
-        print("Generating context...")
-        context = generate_context(trace, hint)
-        print(f"Context generated: {context[:100]}...")  # Print first 100 chars for brevity
-        workflow_result["context"] = context
-
-        # Step 3: Create the La Vague prompt
-        print("Creating La Vague prompt...")
-        lavague_prompt = create_lavague_prompt(trace, hint)
-        print(f"La Vague prompt created: {lavague_prompt[:100]}...")  # Print first 100 chars for brevity
-        workflow_result["lavague_prompt"] = lavague_prompt
-
-        # Step 4: Run the La Vague agent
-        print("Running La Vague agent...")
-        print(url, lavague_prompt)
-        agent_result = run_agent(url=url, lavague_prompt=lavague_prompt)
-        print("Agent execution completed.")
-        workflow_result["agent_result"] = agent_result
-        workflow_result["status"] = "success"
-
+        key = replay_key(trace, hint, url)
+        recording = get_recording(key) if ACTION_REPLAY_ENABLED else None
+        # The prompt is ready before a browser is checked out, so none sits idle through
+        # the LLM calls (or is recycled because one of them failed)
+        lavague_prompt = (get_recorded_prompt(key) if recording else None) or \
+            _build_prompt(trace, hint, workflow_result)
+        with get_driver_pool().driver() as pooled:
+            _run_in_browser(pooled, key, recording, lavague_prompt, url, workflow_result)
     except Exception as e:
         print(f"Error during La Vague workflow execution: {str(e)}")
         workflow_result["status"] = "failed"
@@ -137,6 +217,65 @@ def run_lavague_workflow(trace: str, hint: str, url: str) -> Dict[str, Any]:
     print("La Vague workflow completed.")
     return workflow_result
 
+def _build_prompt(trace: str, hint: str, workflow_result: Dict[str, Any]) -> str:
+    """Compacts the trace and generates the La Vague prompt from it."""
+    # Step 1: Generate the main objective and the context concurrently
+    print("Generating main objective and context...")
+    session = LLMSession()
+    with span("compact_trace") as attributes:
+        prompt_trace, compaction = prepare_trace(trace)
+        attributes.update(compaction)
+    if compaction:
+        workflow_result["trace_compaction"] = compaction
+    with span("build_prompt"):
+        main_objective, context = generate_prompt_parts(prompt_trace, hint, session)
+    print(f"Main objective: {main_objective}")
+    print(f"Context generated: {context[:100]}...")  # Print first 100 chars for brevity
+    workflow_result["main_objective"] = main_objective
+    workflow_result["context"] = context
+
+    # Step 2: Create the La Vague prompt
+    print("Creating La Vague prompt...")
+    lavague_prompt = format_lavague_prompt(main_objective, context)
+    print(f"La Vague prompt created: {lavague_prompt[:100]}...")  # Print first 100 chars for brevity
+    return lavague_prompt
+
+def _run_in_browser(pooled, key: str, recording, lavague_prompt: str, url: str,
+                    workflow_result: Dict[str, Any]) -> None:
+    """
+    Replays the recorded actions of an earlier successful run with the same trace, hint
+    and URL, and falls back to the La Vague agent from the first action that fails.
+    The actions of an agent run that reports success are recorded for next time.
+    """
+    workflow_result["lavague_prompt"] = lavague_prompt
+    completed = 0
+    if recording:
+        print(f"Replaying {len(recording)} recorded actions...")
+        with span("replay") as attributes:
+            completed = replay_actions(pooled.driver, recording)
+            attributes.update({"actions": len(recording), "completed": completed})
+        workflow_result["replayed_actions"] = completed
+        if completed == len(recording):
+            print("Replay completed; skipping the La Vague agent.")
+            workflow_result["replayed"] = True
+            workflow_result["status"] = "success"
+            return
+        print(f"Replay diverged after {completed} actions; falling back to the La Vague agent.")
+
+    # Step 3: Run the La Vague agent
+    print("Running La Vague agent...")
+    debug_dump("La Vague agent input", {"url": url, "lavague_prompt": lavague_prompt})
+    with span("run_agent"), ActionRecorder(pooled.driver) as recorder:
+        # Continue from where the replay stopped; start over only if it never got going
+        agent_result = run_agent(url, lavague_prompt, pooled, navigate=completed == 0)
+    print("Agent execution completed.")
+    workflow_result["agent_result"] = agent_result
+    workflow_result["status"] = "success"
+
+    # Only a run the agent reports as successful is worth replaying next time
+    if ACTION_REPLAY_ENABLED and recorder.actions and getattr(agent_result, "success", True):
+        save_recording(key, (recording or [])[:completed] + recorder.actions, lavague_prompt)
+
 # Example usage
 if __name__ == "__main__":
     # Load the trace data
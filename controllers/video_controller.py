@@ -1,11 +1,53 @@
+import asyncio
 import base64
-from typing import Dict, List, Tuple, Union, Any
+import bisect
+import re
+from typing import AsyncIterator, Dict, Iterator, List, Tuple, Any
 import ffmpeg
+import numpy as np
 import os
-from openai import OpenAI
-import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from core.cache import get_cache, cache_key, hash_bytes, hash_file
+from core.config import MEDIA_WORKERS
+from core.scene_detection import detect_screen_changes, CHANGED_FRACTION, HASH_DISTANCE
+from core.rate_limit import TokenBucket, call_with_retries, call_with_retries_sync
+from core.metrics import span, record_llm_call, record_vision_payload, record_audio_payload
+from core.frame_prep import prepare_frame
+from core.workflow import Workflow
+from core.fingerprint import video_fingerprint
+from core.vad import detect_speech, join_segments, remap_times
+from core.openai_client import (
+    get_openai_client, get_async_openai_client, get_openai_limiter, run_async, iter_async, retryable_errors,
+    OPENAI_MAX_RETRIES
+)
 
-client = OpenAI()
+# Seconds between sampled screenshots in "fixed" sampling mode
+SCREENSHOT_INTERVAL = 3
+
+# "scene" samples a frame whenever the picture changes, bounded by a minimum and maximum
+# gap between frames; "fixed" samples one frame every SCREENSHOT_INTERVAL seconds
+SAMPLING_MODE = os.getenv("PEAR_SAMPLING_MODE", "scene")
+SCENE_THRESHOLD = float(os.getenv("PEAR_SCENE_THRESHOLD", 0.1))
+MIN_FRAME_INTERVAL = float(os.getenv("PEAR_MIN_FRAME_INTERVAL", 0.5))
+MAX_FRAME_INTERVAL = float(os.getenv("PEAR_MAX_FRAME_INTERVAL", 10))
+
+SHOWINFO_PATTERN = re.compile(r"\bn:\s*(\d+)\s+pts:\s*\S+\s+pts_time:\s*([-\d.eE+]+)")
+DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d+):([\d.]+)")
+
+# Extracted audio is mono at this rate: enough for speech, and small enough for Whisper's upload limit
+AUDIO_SAMPLE_RATE = 16000
+
+# Send only the voiced parts of the audio to Whisper, unless nearly all of it is speech anyway
+VAD_ENABLED = os.getenv("PEAR_VAD", "1") == "1"
+VAD_MAX_VOICED_FRACTION = 0.9
+
+# Vision summarization: parallel requests in flight per video and retries on 429s.
+# The request rate is shared by all jobs; see PEAR_OPENAI_RPS in core/openai_client.py
+SUMMARY_CONCURRENCY = 8
+SUMMARY_MAX_RETRIES = 5
 
 def extract_audio(video_path: str, audio_output_path: str) -> None:
     """
@@ -21,199 +63,469 @@ def extract_screenshots(input_file: str, output_folder: str) -> None:
     (
         ffmpeg
         .input(input_file)
-        .filter('fps', fps=1/3)
+        .filter('fps', fps=1/SCREENSHOT_INTERVAL)
         .output(f'{output_folder}/screenshot%04d.png')
         .run()
     )
 
+def sample_frames(video: Any, mode: str = SAMPLING_MODE, scene_threshold: float = SCENE_THRESHOLD,
+                  min_interval: float = MIN_FRAME_INTERVAL, max_interval: float = MAX_FRAME_INTERVAL) -> Any:
+    """
+    Applies the frame sampling filter for the given mode to an ffmpeg video stream.
+    """
+    if mode == "fixed":
+        return video.filter('fps', fps=1/SCREENSHOT_INTERVAL)
+    if mode != "scene":
+        raise ValueError(f"Unknown sampling mode: {mode}")
+    # Always keep the first frame and never go longer than max_interval without one;
+    # in between, keep scene changes that are at least min_interval apart
+    expression = (
+        "isnan(prev_selected_t)"
+        f"+gte(t-prev_selected_t,{max_interval})"
+        f"+gt(scene,{scene_threshold})*gte(t-prev_selected_t,{min_interval})"
+    )
+    return video.filter('select', expression)
+
+def extract_media(video_path: str, screenshots_dir: str, audio_output_path: str,
+                  mode: str = SAMPLING_MODE) -> Dict[str, Any]:
+    """
+    Decodes the video once, writing sampled screenshots and the full audio track as MP3.
+
+    Returns {"frames": {screenshot_path: timestamp_in_seconds}, "duration": seconds or None}.
+    """
+    os.makedirs(screenshots_dir, exist_ok=True)
+    stream = ffmpeg.input(video_path)
+    screenshots = (
+        sample_frames(stream.video, mode)
+        .filter('showinfo')
+        .output(f'{screenshots_dir}/screenshot%04d.png', vsync='vfr')
+    )
+    # Mono 16 kHz speech-quality audio keeps long recordings under Whisper's 25 MB upload limit
+    audio = stream.audio.output(audio_output_path, acodec='libmp3lame', ac=1, ar=AUDIO_SAMPLE_RATE, audio_bitrate='32k')
+    _, stderr = ffmpeg.merge_outputs(screenshots, audio).run(overwrite_output=True, capture_stderr=True)
+    log = stderr.decode('utf-8', 'replace')
+
+    # showinfo logs the presentation timestamp of every frame that reaches the image writer
+    frames = {}
+    for match in SHOWINFO_PATTERN.finditer(log):
+        frame_path = os.path.join(screenshots_dir, f"screenshot{int(match.group(1)) + 1:04d}.png")
+        frames[frame_path] = round(float(match.group(2)), 3)
+
+    duration = DURATION_PATTERN.search(log)
+    if duration is not None:
+        hours, minutes, seconds = duration.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    print(f"Sampled {len(frames)} frames ({mode} mode)")
+    return {"frames": frames, "duration": duration}
+
+def decode_audio(audio_path: str, sample_rate: int = AUDIO_SAMPLE_RATE) -> np.ndarray:
+    """
+    Decodes an audio file to mono float32 samples in [-1, 1] at the given sample rate.
+    """
+    stdout, _ = (
+        ffmpeg.input(audio_path)
+        .output('pipe:', format='f32le', acodec='pcm_f32le', ac=1, ar=sample_rate)
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return np.frombuffer(stdout, dtype=np.float32)
+
+def encode_audio(samples: np.ndarray, output_path: str, sample_rate: int = AUDIO_SAMPLE_RATE) -> str:
+    """
+    Encodes mono float32 samples as MP3 with the same settings extract_media uses.
+    """
+    (
+        ffmpeg.input('pipe:', format='f32le', ac=1, ar=sample_rate)
+        .output(output_path, acodec='libmp3lame', ac=1, ar=sample_rate, audio_bitrate='32k')
+        .run(input=samples.astype(np.float32).tobytes(), overwrite_output=True, capture_stdout=True, capture_stderr=True)
+    )
+    return output_path
+
+def trim_audio(audio_path: str, start: float, output_path: str) -> str:
+    """
+    Copies the audio from start (in seconds) to the end into output_path, without re-encoding.
+    """
+    (
+        ffmpeg.input(audio_path, ss=start)
+        .output(output_path, acodec='copy')
+        .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+    )
+    return output_path
+
+def load_samples(samples_path: str) -> np.ndarray:
+    """Reads samples written by extract_and_fingerprint back without decoding the audio again."""
+    return np.fromfile(samples_path, dtype=np.float32)
+
+def extract_and_fingerprint(video_path: str, screenshots_dir: str, audio_output_path: str,
+                            mode: str = SAMPLING_MODE) -> Dict[str, Any]:
+    """
+    Runs extract_media and fingerprints the sampled frames and audio for incremental reprocessing.
+
+    Returns extract_media's result with a "fingerprint" added. With VAD enabled, the speech
+    segments are found from the same decoded samples, which are kept next to the audio
+    ("samples_path") so transcribe_audio can join the voiced parts without decoding again.
+    """
+    media = extract_media(video_path, screenshots_dir, audio_output_path, mode)
+    samples = decode_audio(audio_output_path)
+    media["fingerprint"] = video_fingerprint(media["frames"], samples, AUDIO_SAMPLE_RATE, media["duration"])
+    if VAD_ENABLED:
+        media["speech"] = detect_speech(samples, AUDIO_SAMPLE_RATE)
+        media["samples_path"] = f"{os.path.splitext(audio_output_path)[0]}.f32"
+        samples.tofile(media["samples_path"])
+    return media
+
+_media_pool = None
+_media_pool_lock = threading.Lock()
+
+def get_media_pool() -> ProcessPoolExecutor:
+    """Returns the process pool for media work, starting it on first use."""
+    global _media_pool
+    with _media_pool_lock:
+        if _media_pool is None:
+            # spawn, not fork: the parent has live threads (jobs, event loop, HTTP pools)
+            _media_pool = ProcessPoolExecutor(MEDIA_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _media_pool
+
+def shutdown_media_pool() -> None:
+    global _media_pool
+    with _media_pool_lock:
+        if _media_pool is not None:
+            _media_pool.shutdown(wait=False, cancel_futures=True)
+            _media_pool = None
+
+def process_media(video_path: str, screenshots_dir: str, audio_output_path: str,
+                  mode: str = SAMPLING_MODE) -> Dict[str, Any]:
+    """
+    Extracts and fingerprints a video in the media process pool, so decoding and hashing
+    for several videos run in parallel without contending for this process's GIL.
+    """
+    if MEDIA_WORKERS <= 0:
+        return extract_and_fingerprint(video_path, screenshots_dir, audio_output_path, mode)
+    return get_media_pool().submit(
+        extract_and_fingerprint, video_path, screenshots_dir, audio_output_path, mode
+    ).result()
+
 def encode_image(image_path: str) -> str:
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
-def group_images(images: List[str]) -> Dict[str, Dict[str, Any]]:
-    """
-    Group images and generate summaries.
-    """
-    sorted_images = sorted(images)
-    screen_changes = {}
-    previous_summary = None
-    screen_start_time = None
-
-    for i, image_path in enumerate(sorted_images):
-        timestamp = i
-        base64_image = encode_image(image_path)
-        print(f"Processing image {i+1} of {len(images)}: {image_path}")
-        
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "SUMMARIZE THIS SCREENSHOT."},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                    ],
-                }
+SUMMARY_PROMPT = "SUMMARIZE THIS SCREENSHOT."
+
+def summary_messages(base64_image: str, mime_type: str = "image/jpeg", detail: str = "auto") -> List[Dict[str, Any]]:
+    """
+    Builds the vision prompt used to summarize a screenshot.
+    """
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": SUMMARY_PROMPT},
+                {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{base64_image}", "detail": detail}}
             ],
-            max_tokens=300,
+        }
+    ]
+
+async def summarize_image(image_path: str, semaphore: asyncio.Semaphore, limiter: TokenBucket,
+                          previous_path: str = None, payload_stats: Dict[str, int] = None) -> str:
+    """
+    Asks the vision model to summarize a single screenshot, retrying on rate limits.
+
+    The frame is downscaled and re-encoded (and optionally cropped to what changed since
+    previous_path) before upload. Summaries are cached by the content hash of that payload,
+    so identical frames are only sent once.
+    """
+    cache = get_cache()
+    async with semaphore:
+        frame = await asyncio.to_thread(prepare_frame, image_path, previous_path)
+        record_vision_payload(frame["original_bytes"], frame["bytes"], frame["original_tokens"], frame["tokens"])
+        if payload_stats is not None:
+            for field in ("original_bytes", "bytes", "original_tokens", "tokens"):
+                payload_stats[field] = payload_stats.get(field, 0) + frame[field]
+
+        key = cache_key(hash_bytes(frame["data"]), "gpt-4o", SUMMARY_PROMPT, max_tokens=300, detail=frame["detail"])
+        summary = cache.get(key)
+        if summary is not None:
+            record_llm_call("gpt-4o", "vision_summary", 0.0, status="cached")
+            return summary
+
+        retries = []
+        start = time.perf_counter()
+        try:
+            response = await call_with_retries(
+                get_async_openai_client().chat.completions.create,
+                model="gpt-4o",
+                messages=summary_messages(base64.b64encode(frame["data"]).decode('utf-8'), frame["mime_type"], frame["detail"]),
+                max_tokens=300,
+                retry_on=retryable_errors(),
+                max_retries=SUMMARY_MAX_RETRIES,
+                limiter=limiter,
+                on_retry=lambda attempt, error: retries.append(attempt),
+            )
+        except Exception:
+            record_llm_call("gpt-4o", "vision_summary", time.perf_counter() - start, status="error", retries=len(retries))
+            raise
+    record_llm_call("gpt-4o", "vision_summary", time.perf_counter() - start, usage=response.usage, retries=len(retries))
+    summary = response.choices[0].message.content.strip()
+    cache.set(key, summary)
+    return summary
+
+async def iter_summaries(image_paths: List[str],
+                         concurrency: int = SUMMARY_CONCURRENCY,
+                         requests_per_second: float = None) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Summarizes screenshots concurrently, yielding (index, summary) pairs as each finishes.
+
+    Requests take tokens from the process-wide OpenAI limiter unless requests_per_second
+    is given. Each screenshot is compared with the one before it when the frame
+    preparation crops to changes.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = TokenBucket(requests_per_second) if requests_per_second else get_openai_limiter()
+    payload_stats = {}
+    previous_paths = [None] + image_paths[:-1]
+
+    async def indexed(index: int, path: str, previous: str) -> Tuple[int, str]:
+        return index, await summarize_image(path, semaphore, limiter, previous, payload_stats)
+
+    tasks = [
+        asyncio.ensure_future(indexed(index, path, previous))
+        for index, (path, previous) in enumerate(zip(image_paths, previous_paths))
+    ]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # The consumer stopped early or a request failed: do not leave requests running
+        for task in tasks:
+            task.cancel()
+    if payload_stats:
+        print(
+            f"Vision payloads: {payload_stats['bytes']} of {payload_stats['original_bytes']} bytes, "
+            f"~{payload_stats['tokens']} of ~{payload_stats['original_tokens']} image tokens"
         )
-        current_summary = response.choices[0].message.content.strip()
-
-        if previous_summary is None:
-            previous_summary = current_summary
-            screen_start_time = timestamp
-            continue
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": f'DID THE SCREEN CHANGE BETWEEN THESE TWO IMAGES: "{previous_summary}" AND THIS NEW SCREENSHOT? ANSWER WITH "YES" OR "NO". RESPOND WITH ONLY LOWERCASE YES OR LOWERCASE NO FOLLOWED BY NO PUNCTUATION'},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                    ],
-                }
-            ],
-            max_tokens=300,
+
+async def summarize_images(image_paths: List[str],
+                           concurrency: int = SUMMARY_CONCURRENCY,
+                           requests_per_second: float = None) -> List[str]:
+    """Summarizes screenshots concurrently, returning summaries in the same order as image_paths."""
+    summaries = [None] * len(image_paths)
+    async for index, summary in iter_summaries(image_paths, concurrency, requests_per_second):
+        summaries[index] = summary
+    return summaries
+
+async def iter_screens_async(images: List[str],
+                             timestamps: Dict[str, float] = None,
+                             duration: float = None,
+                             changed_fraction: float = CHANGED_FRACTION,
+                             hash_distance: int = HASH_DISTANCE,
+                             concurrency: int = SUMMARY_CONCURRENCY,
+                             requests_per_second: float = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Groups images into screens and yields (key_frame_path, {"interval", "summary"}) for
+    each screen as soon as its summary is ready, so in completion order, not time order.
+
+    Screen boundaries are detected locally from the decoded frames, so the vision
+    model is only called once for each detected screen, and those calls run concurrently.
+
+    Intervals are in seconds: each screen runs from its first frame to the first frame of
+    the next screen (or to the end of the video). Frame times come from timestamps; without
+    them, frames are assumed to be SCREENSHOT_INTERVAL seconds apart.
+    """
+    if timestamps is None:
+        sorted_images = sorted(images)
+        timestamps = {path: i * SCREENSHOT_INTERVAL for i, path in enumerate(sorted_images)}
+    else:
+        sorted_images = sorted(images, key=lambda path: timestamps[path])
+
+    with span("detect_screens", frames=len(sorted_images)):
+        # Off the event loop, which is shared with other jobs' summary requests
+        screens = await asyncio.to_thread(
+            detect_screen_changes, sorted_images, changed_fraction=changed_fraction, hash_distance=hash_distance
         )
-        screen_changed = response.choices[0].message.content.strip().lower() == 'yes'
+    print(f"Detected {len(screens)} screens in {len(sorted_images)} images")
 
-        if screen_changed:
-            screen_changes[sorted_images[i-1]] = {
-                "interval": (screen_start_time, timestamp - 1),
-                "summary": previous_summary
+    # The last frame of a screen shows its final state (e.g. a filled-in form)
+    key_frames = [sorted_images[end] for _, end in screens]
+    starts = [timestamps[sorted_images[start]] for start, _ in screens]
+    if screens:
+        last_frame_time = timestamps[sorted_images[-1]]
+        ends = starts[1:] + [max(duration or 0, last_frame_time)]
+    else:
+        ends = []
+
+    with span("summarize_screens", screens=len(key_frames)):
+        async for index, summary in iter_summaries(key_frames, concurrency, requests_per_second):
+            yield key_frames[index], {
+                "interval": (starts[index], ends[index]),
+                "summary": summary
             }
-            screen_start_time = timestamp
-            previous_summary = current_summary
 
-    if screen_start_time is not None:
-        screen_changes[sorted_images[-1]] = {
-            "interval": (screen_start_time, len(sorted_images) - 1),
-            "summary": previous_summary
-        }
+async def group_images_async(images: List[str], **kwargs) -> Dict[str, Dict[str, Any]]:
+    """
+    Group images into screens and generate one summary per screen.
 
-    return screen_changes
+    Returns screens keyed by key frame path, in time order; see iter_screens_async().
+    """
+    screens = [screen async for screen in iter_screens_async(images, **kwargs)]
+    return dict(sorted(screens, key=lambda screen: screen[1]["interval"][0]))
 
-def process_video(video_path: str, screenshot_to_time_map: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+def group_images(images: List[str], **kwargs) -> Dict[str, Dict[str, Any]]:
     """
-    Process video by extracting audio chunks based on screenshot timestamps.
+    Synchronous wrapper around group_images_async for callers outside an event loop.
+
+    Runs on the shared OpenAI event loop, so concurrent jobs share one connection pool.
     """
-    temp_audio_dir = "temp_audio_chunks"
-    os.makedirs(temp_audio_dir, exist_ok=True)
-    
-    audio_file_map = {}
-    
-    for screenshot_url, info in screenshot_to_time_map.items():
-        start_time, end_time = info['interval']
-        output_filename = f"{start_time}-{end_time}.mp3"
-        output_path = os.path.join(temp_audio_dir, output_filename)
-        
-        (
-            ffmpeg
-            .input(video_path, ss=start_time, t=end_time-start_time)
-            .output(output_path, acodec='libmp3lame')
-            .run(overwrite_output=True)
-        )
-        
-        audio_file_map[f"{start_time}-{end_time}"] = output_path
-    
-    return audio_file_map
+    return run_async(group_images_async(images, **kwargs))
+
+def iter_screens(images: List[str], **kwargs) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Synchronous counterpart of iter_screens_async, run on the shared OpenAI event loop."""
+    return iter_async(iter_screens_async(images, **kwargs))
 
-def transcribe_audio_files(audio_file_map: Dict[str, str], video_duration: float) -> Dict[str, str]:
+def transcribe_file(audio_path: str) -> List[Dict[str, Any]]:
     """
-    Transcribe audio files using OpenAI's Whisper model, including 5 seconds after each interval if available.
+    Transcribe an audio file in one Whisper request, returning word-level timestamps.
+
+    Each word is a dict with "word", "start" and "end" (in seconds).
     """
-    transcriptions = {}
-    
-    # Sort intervals by start time
-    sorted_intervals = sorted(audio_file_map.keys(), key=lambda x: int(x.split('-')[0]))
-    
-    for i, interval_str in enumerate(sorted_intervals):
-        start, end = map(int, interval_str.split('-'))
-        
-        # Determine the extended end time (5 seconds more or until the next interval starts)
-        if i < len(sorted_intervals) - 1:
-            next_start = int(sorted_intervals[i+1].split('-')[0])
-            extended_end = min(end + 5, next_start, int(video_duration))
-        else:
-            extended_end = min(end + 5, int(video_duration))
-        
-        # If we can extend the audio, do so
-        if extended_end > end:
-            temp_extended_audio = f"temp_extended_{interval_str}.mp3"
-            (
-                ffmpeg
-                .input(audio_file_map[interval_str])
-                .filter('atrim', duration=extended_end-start)
-                .output(temp_extended_audio)
-                .overwrite_output()
-                .run(quiet=True)
-            )
-            audio_to_transcribe = temp_extended_audio
-        else:
-            audio_to_transcribe = audio_file_map[interval_str]
-        
-        with open(audio_to_transcribe, 'rb') as audio:
-            response = client.audio.transcriptions.create(
+    cache = get_cache()
+    key = cache_key(hash_file(audio_path), "whisper-1", "", response_format="verbose_json", timestamp_granularities=["word"])
+    words = cache.get(key)
+    if words is not None:
+        record_llm_call("whisper-1", "transcription", 0.0, status="cached")
+        return words
+
+    def request():
+        # Reopened per attempt, so a retry uploads the whole file again
+        with open(audio_path, 'rb') as audio:
+            return get_openai_client().audio.transcriptions.create(
                 model="whisper-1",
                 file=audio,
-                response_format="text"
+                response_format="verbose_json",
+                timestamp_granularities=["word"]
             )
-            transcriptions[interval_str] = response
-        
-        # Clean up temporary file if it was created
-        if extended_end > end:
-            os.remove(temp_extended_audio)
 
-    print("\n--- Transcription results ---")
-    print(json.dumps(transcriptions, indent=2))
+    retries = []
+    start = time.perf_counter()
+    try:
+        response = call_with_retries_sync(
+            request,
+            retry_on=retryable_errors(),
+            max_retries=OPENAI_MAX_RETRIES,
+            limiter=get_openai_limiter(),
+            on_retry=lambda attempt, error: retries.append(attempt),
+        )
+    except Exception:
+        record_llm_call("whisper-1", "transcription", time.perf_counter() - start, status="error", retries=len(retries))
+        raise
+    record_llm_call("whisper-1", "transcription", time.perf_counter() - start, retries=len(retries))
+    words = [{"word": w.word, "start": w.start, "end": w.end} for w in (response.words or [])]
+    cache.set(key, words)
+    return words
+
+def transcribe_audio(audio_path: str, vad: bool = VAD_ENABLED, start: float = 0.0,
+                     samples: np.ndarray = None, segments: List[Tuple[float, float]] = None) -> List[Dict[str, Any]]:
+    """
+    Transcribe the audio track from start (in seconds), returning word-level timestamps
+    in the original timeline.
+
+    With vad set, silent stretches are found locally first: a silent track makes no
+    request at all, and otherwise only the voiced segments (joined with short pauses)
+    are uploaded, in one request. Pass the samples and speech segments from
+    extract_and_fingerprint to skip decoding the audio again.
+    """
+    if not vad:
+        return transcribe_from(audio_path, start)
+
+    if samples is None:
+        samples = decode_audio(audio_path)
+    if segments is None:
+        segments = detect_speech(samples, AUDIO_SAMPLE_RATE)
+    segments = [(max(seg_start, start), seg_end) for seg_start, seg_end in segments if seg_end > start]
+    duration = max(0.0, len(samples) / AUDIO_SAMPLE_RATE - start)
+    voiced = sum(end - begin for begin, end in segments)
+    print(f"Voice activity: {len(segments)} speech segments, {voiced:.1f}s of {duration:.1f}s")
 
-    return transcriptions
+    if not segments:
+        record_audio_payload(duration, 0.0, 0)
+        return []
+    if voiced >= VAD_MAX_VOICED_FRACTION * duration:
+        record_audio_payload(duration, duration, len(segments))
+        return transcribe_from(audio_path, start)
+
+    joined, offsets = join_segments(samples, AUDIO_SAMPLE_RATE, segments)
+    record_audio_payload(duration, len(joined) / AUDIO_SAMPLE_RATE, len(segments))
+    voiced_path = encode_audio(joined, f"{os.path.splitext(audio_path)[0]}.voiced.mp3")
+    words = transcribe_file(voiced_path)
+    starts = remap_times([w["start"] for w in words], offsets)
+    ends = remap_times([w["end"] for w in words], offsets)
+    return [{"word": w["word"], "start": s, "end": e} for w, s, e in zip(words, starts, ends)]
+
+def transcribe_from(audio_path: str, start: float = 0.0) -> List[Dict[str, Any]]:
+    """Transcribes the whole file, or only the part from start on, in the original timeline."""
+    if not start:
+        return transcribe_file(audio_path)
+    tail_path = trim_audio(audio_path, start, f"{os.path.splitext(audio_path)[0]}.tail.mp3")
+    return [
+        {"word": w["word"], "start": w["start"] + start, "end": w["end"] + start}
+        for w in transcribe_file(tail_path)
+    ]
+
+def align_transcription(words: List[Dict[str, Any]], screenshot_info: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Bucket transcribed words into the screen intervals produced by group_images.
+
+    A word belongs to the last screen that started at or before its midpoint.
+    """
+    intervals = sorted(info['interval'] for info in screenshot_info.values())
+    if not intervals:
+        return {}
+
+    starts = [start for start, _ in intervals]
+    buckets = [[] for _ in intervals]
+    for word in words:
+        midpoint = (word["start"] + word["end"]) / 2
+        buckets[max(0, bisect.bisect_right(starts, midpoint) - 1)].append(word["word"].strip())
+
+    return {
+        f"{start}-{end}": " ".join(bucket)
+        for (start, end), bucket in zip(intervals, buckets)
+    }
 
 def combine_workflow_data(screenshot_info: Dict[str, Dict[str, Any]], 
-                          transcriptions: Dict[str, str]) -> List[Dict[str, Any]]:
+                          transcriptions: Dict[str, str]) -> Workflow:
     """
-    Combine screenshot info and transcriptions into a single workflow data structure.
+    Combine screenshot info and transcriptions into a Workflow, one step per screen.
+
+    Use Workflow.to_workflow_data() for the JSON response format.
     """
-    combined_data = []
+    workflow = Workflow()
     
     for screenshot_path, info in screenshot_info.items():
         start_time, end_time = info['interval']
         interval_str = f"{start_time}-{end_time}"
-        combined_data.append({
-            "screenshot": screenshot_path,
-            "interval": {"start": start_time, "end": end_time},
-            "summary": info['summary'],
-            "transcription": transcriptions.get(interval_str, "")
-        })
+        workflow.add_node(screenshot_path, start_time, end_time, None, info['summary'],
+                          transcription=transcriptions.get(interval_str, ""))
     
-    return combined_data
+    return workflow
 
 def process_workflow(video_path: str, screenshot_dir: str) -> List[Dict[str, Any]]:
     """
     Process a video file: extract screenshots, group images, process audio, and transcribe.
     """
-    # Get video duration
-    video_duration = get_video_duration(video_path)
-
-    # Extract screenshots
-    extract_screenshots(video_path, screenshot_dir)
-
-    # Get list of screenshot paths
-    screenshot_paths = [os.path.join(screenshot_dir, f) for f in os.listdir(screenshot_dir) if f.endswith('.png')]
+    # Extract screenshots and audio in a single decode
+    audio_path = os.path.join(screenshot_dir, "audio.mp3")
+    media = extract_media(video_path, screenshot_dir, audio_path)
 
     # Group images
-    grouped_images = group_images(screenshot_paths)
-
-    # Process video to get audio clips
-    audio_file_map = process_video(video_path, grouped_images)
+    frames = media["frames"]
+    grouped_images = group_images(list(frames), timestamps=frames, duration=media["duration"])
 
-    # Transcribe audio clips
-    transcriptions = transcribe_audio_files(audio_file_map, video_duration)  # Pass video_duration here
+    # Transcribe the audio once and split it across the screens
+    words = transcribe_audio(audio_path)
+    transcriptions = align_transcription(words, grouped_images)
 
     # Combine workflow data
-    return combine_workflow_data(grouped_images, transcriptions)
+    return combine_workflow_data(grouped_images, transcriptions).to_workflow_data()
 
 def get_video_duration(video_path: str) -> float:
     """Get the duration of the video in seconds."""
@@ -0,0 +1,5 @@
+import os
+
+# Worker processes for decoding and fingerprinting, shared by all jobs (0 runs them in the calling thread).
+# Kept here, away from the media code, so the job queue can size itself from it without importing ffmpeg
+MEDIA_WORKERS = int(os.getenv("PEAR_MEDIA_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
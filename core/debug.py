@@ -0,0 +1,14 @@
+import json
+import os
+from typing import Any
+
+# Set PEAR_LOG_LEVEL=DEBUG to print the full intermediate payloads of each request
+LOG_LEVEL = os.getenv("PEAR_LOG_LEVEL", "INFO").upper()
+DEBUG = LOG_LEVEL == "DEBUG"
+
+def debug_dump(title: str, payload: Any) -> None:
+    """Pretty-prints a payload, only when debug logging is enabled."""
+    if not DEBUG:
+        return
+    print(f"\n--- {title} ---")
+    print(json.dumps(payload, indent=2))
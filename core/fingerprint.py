@@ -0,0 +1,161 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.scene_detection import load_frames, dhash
+
+# Frame fingerprints are 16x16 difference hashes: finer than scene detection's, so small edits register
+FINGERPRINT_HASH_SIZE = 16
+# Two sampled frames are the same content if their hashes differ by at most this many bits (of 256)...
+FRAME_HASH_DISTANCE = 12
+# ...and they were sampled within this many seconds of each other
+FRAME_TIME_TOLERANCE = 0.25
+
+# Audio is fingerprinted in windows of this many seconds, each an envelope of per-bucket loudness
+AUDIO_WINDOW_SECONDS = 5.0
+AUDIO_BUCKET_SECONDS = 0.25
+# Windows whose envelopes differ by more than this on average (in dB) count as changed
+AUDIO_DB_TOLERANCE = 3.0
+# Floor for the loudness of silent buckets, so silence compares equal to silence
+AUDIO_SILENCE_DB = -80.0
+
+# Reusing less than this much of an earlier recording is not worth splicing
+MIN_REUSE_SECONDS = 1.0
+# Splice unchanged steps from earlier versions of a recording instead of reprocessing them
+INCREMENTAL_REPROCESSING = os.getenv("PEAR_INCREMENTAL", "1") == "1"
+# How many recently processed videos a new upload is diffed against
+FINGERPRINT_CANDIDATES = int(os.getenv("PEAR_FINGERPRINT_CANDIDATES", 20))
+
+def frame_fingerprints(frames: Dict[str, float]) -> List[Tuple[float, str]]:
+    """
+    Fingerprints sampled frames as (timestamp, hex dHash) pairs in time order.
+
+    frames maps screenshot paths to timestamps, as returned by extract_media.
+    """
+    paths = sorted(frames, key=frames.get)
+    if not paths:
+        return []
+    hashes = np.packbits(dhash(load_frames(paths), FINGERPRINT_HASH_SIZE), axis=1)
+    return [(frames[path], bits.tobytes().hex()) for path, bits in zip(paths, hashes)]
+
+def audio_fingerprints(samples: np.ndarray, sample_rate: int) -> List[List[float]]:
+    """
+    Fingerprints mono audio as one loudness envelope (dB per bucket) per window.
+    """
+    bucket = max(1, int(AUDIO_BUCKET_SECONDS * sample_rate))
+    buckets_per_window = int(round(AUDIO_WINDOW_SECONDS / AUDIO_BUCKET_SECONDS))
+    count = len(samples) // bucket
+    if count == 0:
+        return []
+    power = np.square(samples[:count * bucket].astype(np.float64)).reshape(count, bucket).mean(axis=1)
+    loudness = np.maximum(10 * np.log10(power + 1e-12), AUDIO_SILENCE_DB)
+    return [
+        np.round(loudness[i:i + buckets_per_window], 1).tolist()
+        for i in range(0, count, buckets_per_window)
+    ]
+
+def video_fingerprint(frames: Dict[str, float], samples: np.ndarray, sample_rate: int,
+                      duration: float = None) -> Dict[str, Any]:
+    return {
+        "duration": duration,
+        "frames": frame_fingerprints(frames),
+        "audio_window": AUDIO_WINDOW_SECONDS,
+        "audio": audio_fingerprints(samples, sample_rate)
+    }
+
+def _hash_distance(a: str, b: str) -> int:
+    return int(np.unpackbits(np.frombuffer(bytes.fromhex(a), dtype=np.uint8)
+                             ^ np.frombuffer(bytes.fromhex(b), dtype=np.uint8)).sum())
+
+def _frames_prefix(new: List[Tuple[float, str]], old: List[Tuple[float, str]]) -> float:
+    """Time of the first sampled frame where the recordings diverge."""
+    for i, (new_time, new_hash) in enumerate(new):
+        if i >= len(old):
+            return new_time
+        old_time, old_hash = old[i]
+        if abs(new_time - old_time) > FRAME_TIME_TOLERANCE or _hash_distance(new_hash, old_hash) > FRAME_HASH_DISTANCE:
+            return min(new_time, old_time)
+    return new[-1][0] if new else 0.0
+
+def _audio_prefix(new: List[List[float]], old: List[List[float]], window: float) -> float:
+    """Start of the first audio window where the recordings diverge."""
+    for i, (new_envelope, old_envelope) in enumerate(zip(new, old)):
+        if len(new_envelope) != len(old_envelope):
+            return i * window
+        difference = np.abs(np.asarray(new_envelope) - np.asarray(old_envelope)).mean()
+        if difference > AUDIO_DB_TOLERANCE:
+            return i * window
+    return min(len(new), len(old)) * window
+
+def unchanged_prefix(new: Dict[str, Any], old: Dict[str, Any]) -> float:
+    """
+    Returns how many seconds from the start of the new recording match the old one,
+    in both the sampled frames and the audio.
+    """
+    if new.get("audio_window") != old.get("audio_window"):
+        return 0.0
+    return min(
+        _frames_prefix(new["frames"], old["frames"]),
+        _audio_prefix(new["audio"], old["audio"], new["audio_window"])
+    )
+
+def find_base(fingerprint: Dict[str, Any],
+              candidates: List[Tuple[str, Dict[str, Any]]]) -> Optional[Tuple[str, float]]:
+    """
+    Picks the earlier recording sharing the longest unchanged prefix with this one.
+
+    candidates are (video_hash, fingerprint) pairs. Returns (video_hash, prefix_seconds),
+    or None if nothing shares at least MIN_REUSE_SECONDS.
+    """
+    best = None
+    for video_hash, candidate in candidates:
+        prefix = unchanged_prefix(fingerprint, candidate)
+        if prefix >= MIN_REUSE_SECONDS and (best is None or prefix > best[1]):
+            best = (video_hash, prefix)
+    return best
+
+def reusable_steps(steps: List[Dict[str, Any]], prefix: float) -> List[Dict[str, Any]]:
+    """
+    Returns the leading workflow steps that end within the unchanged prefix.
+
+    The final step of the earlier workflow is never reused: it ends where that recording
+    stopped, not at a screen change, so the screen may continue in the new one.
+    """
+    reused = []
+    for step in steps[:-1]:
+        if step["interval"]["end"] > prefix:
+            break
+        reused.append(step)
+    return reused
+
+def find_reusable_work(store, video_hash: str, fingerprint: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], float]:
+    """
+    Looks in the workflow store for an earlier version of this recording.
+
+    Returns the workflow steps and transcript words that can be spliced in unchanged, and
+    the time (in seconds) from which the new recording still has to be processed.
+    """
+    candidates = [
+        (candidate_hash, candidate)
+        for candidate_hash, candidate in store.recent_fingerprints(FINGERPRINT_CANDIDATES)
+        if candidate_hash != video_hash
+    ]
+    base = find_base(fingerprint, candidates)
+    if base is None:
+        return [], [], 0.0
+    base_hash, prefix = base
+
+    stored = store.find_workflow(base_hash)
+    transcript = store.get_transcript(base_hash)
+    if stored is None or transcript is None:
+        return [], [], 0.0
+    steps = reusable_steps(stored["workflow_data"], prefix)
+    if not steps:
+        return [], [], 0.0
+
+    cut = steps[-1]["interval"]["end"]
+    words = [word for word in transcript if (word["start"] + word["end"]) / 2 < cut]
+    print(f"Reusing {len(steps)} steps up to {cut}s from earlier recording {base_hash[:12]} "
+          f"(unchanged for {prefix:.1f}s)")
+    return steps, words, cut
@@ -0,0 +1,127 @@
+import io
+import math
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Frames are shrunk to fit within these dimensions before upload
+VISION_MAX_WIDTH = int(os.getenv("PEAR_VISION_MAX_WIDTH", 1024))
+VISION_MAX_HEIGHT = int(os.getenv("PEAR_VISION_MAX_HEIGHT", 1024))
+# Upload encoding: "jpeg", "webp" or "png", and the lossy quality for jpeg/webp
+VISION_FORMAT = os.getenv("PEAR_VISION_FORMAT", "jpeg")
+VISION_QUALITY = int(os.getenv("PEAR_VISION_QUALITY", 80))
+# OpenAI image detail level: "low", "high" or "auto"
+VISION_DETAIL = os.getenv("PEAR_VISION_DETAIL", "auto")
+# Crop each frame to the region that changed since the previous screen
+VISION_CROP_CHANGES = os.getenv("PEAR_VISION_CROP_CHANGES", "0") == "1"
+
+# Change detection for cropping runs on a grid this many pixels per cell
+CROP_CELL_SIZE = 16
+# Grayscale difference (0-255) above which a grid cell counts as changed
+CROP_PIXEL_DELTA = 24
+# Pixels of context kept around the changed region
+CROP_PADDING = 48
+# Crops smaller than this fraction of the frame area are too narrow to summarize; send the full frame
+CROP_MIN_AREA = 0.05
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+def estimate_image_tokens(width: int, height: int, detail: str = "auto") -> int:
+    """
+    Estimates the vision input tokens for an image, following OpenAI's published tiling rules.
+
+    "auto" is counted as "high", since that is what the model picks for large screenshots.
+    """
+    if detail == "low":
+        return 85
+    # Fit within 2048x2048, then scale down so the shortest side is at most 768
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 170 * tiles + 85
+
+def changed_region(image: Image.Image, previous: Image.Image,
+                   padding: int = CROP_PADDING) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Finds the bounding box (left, top, right, bottom) of the area that differs between two frames.
+
+    Returns None when the frames have different sizes or nothing changed.
+    """
+    if image.size != previous.size:
+        return None
+    width, height = image.size
+    grid = (max(1, width // CROP_CELL_SIZE), max(1, height // CROP_CELL_SIZE))
+    current_cells = np.asarray(image.convert("L").resize(grid, Image.BOX), dtype=np.int16)
+    previous_cells = np.asarray(previous.convert("L").resize(grid, Image.BOX), dtype=np.int16)
+    rows, cols = np.nonzero(np.abs(current_cells - previous_cells) > CROP_PIXEL_DELTA)
+    if len(rows) == 0:
+        return None
+
+    cell_width, cell_height = width / grid[0], height / grid[1]
+    return (
+        max(0, int(cols.min() * cell_width) - padding),
+        max(0, int(rows.min() * cell_height) - padding),
+        min(width, int(math.ceil((cols.max() + 1) * cell_width)) + padding),
+        min(height, int(math.ceil((rows.max() + 1) * cell_height)) + padding),
+    )
+
+def encode_frame(image: Image.Image, image_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "png":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        image.save(buffer, format=image_format.upper(), quality=quality)
+    return buffer.getvalue()
+
+def prepare_frame(image_path: str, previous_path: str = None,
+                  max_width: int = VISION_MAX_WIDTH, max_height: int = VISION_MAX_HEIGHT,
+                  image_format: str = VISION_FORMAT, quality: int = VISION_QUALITY,
+                  detail: str = VISION_DETAIL, crop_changes: bool = VISION_CROP_CHANGES) -> Dict[str, Any]:
+    """
+    Prepares a screenshot for a vision request: optional crop to the changed region,
+    downscale to fit max_width x max_height, and re-encode.
+
+    Returns the encoded bytes with their mime type and detail level, plus the
+    original and prepared sizes and estimated token counts.
+    """
+    original_bytes = os.path.getsize(image_path)
+    with Image.open(image_path) as source:
+        image = source.convert("RGB")
+    original_size = image.size
+
+    crop = None
+    if crop_changes and previous_path is not None:
+        with Image.open(previous_path) as previous:
+            crop = changed_region(image, previous)
+        width, height = image.size
+        if crop is not None and (crop[2] - crop[0]) * (crop[3] - crop[1]) >= CROP_MIN_AREA * width * height:
+            image = image.crop(crop)
+        else:
+            crop = None
+
+    # thumbnail keeps the aspect ratio and never upscales
+    image.thumbnail((max_width, max_height), Image.LANCZOS)
+
+    data = encode_frame(image, image_format, quality)
+    # Flat, synthetic-looking screens can compress better losslessly than as JPEG/WebP
+    if image_format != "png" and len(data) > original_bytes:
+        png_data = encode_frame(image, "png", quality)
+        if len(png_data) < len(data):
+            data, image_format = png_data, "png"
+
+    return {
+        "data": data,
+        "mime_type": MIME_TYPES[image_format],
+        "detail": detail,
+        "crop": crop,
+        "original_size": original_size,
+        "size": image.size,
+        "original_bytes": original_bytes,
+        "bytes": len(data),
+        "original_tokens": estimate_image_tokens(*original_size, "auto"),
+        "tokens": estimate_image_tokens(*image.size, detail)
+    }
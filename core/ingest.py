@@ -0,0 +1,160 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+# Uploaded videos are stored here under their content hash
+UPLOAD_DIR = Path("data") / "uploads"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class UploadError(Exception):
+    """Raised when an upload request is malformed."""
+
+class HashingFileWriter:
+    """
+    Writes chunks to a temporary file in the upload directory while hashing them.
+    """
+    def __init__(self, directory: Path, filename: str):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.filename = filename
+        self.size = 0
+        self._digest = hashlib.sha256()
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        self._file = os.fdopen(fd, "wb", buffering=UPLOAD_CHUNK_SIZE)
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._digest.update(data)
+        self.size += len(data)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def discard(self) -> None:
+        self.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def commit(self) -> Path:
+        """Moves the file to its content-addressed name, reusing an identical earlier upload."""
+        self.close()
+        suffix = Path(self.filename).suffix.lower() or ".mp4"
+        final_path = self.directory / f"{self.hexdigest}{suffix}"
+        if final_path.exists():
+            os.remove(self.temp_path)
+        else:
+            os.replace(self.temp_path, final_path)
+        return final_path
+
+    @property
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+async def receive_video_upload(request: Request, field_name: str = "file",
+                               upload_dir: Path = UPLOAD_DIR) -> Dict[str, Any]:
+    """
+    Streams a multipart/form-data upload straight to disk.
+
+    The request body is parsed as it arrives and the file part is written in chunks
+    and hashed on the fly, so memory use does not depend on the size of the video.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected a multipart/form-data request")
+
+    state = {"headers": {}, "field": b"", "value": b"", "writer": None, "ended": False}
+    writers = []
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data: bytes, start: int, end: int):
+        state["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["field"].lower()] = state["value"]
+        state["field"] = b""
+        state["value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        filename = disposition.get(b"filename")
+        if name == field_name and filename and not writers:
+            state["writer"] = HashingFileWriter(upload_dir, os.path.basename(filename.decode("utf-8", "replace")))
+            writers.append(state["writer"])
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if state["writer"] is not None:
+            state["writer"].write(data[start:end])
+
+    def on_part_end():
+        if state["writer"] is not None:
+            state["writer"].close()
+            state["writer"] = None
+
+    def on_end():
+        state["ended"] = True
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_end": on_end,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+        # The parser accepts a body that stops early, so check the closing boundary arrived
+        if not state["ended"]:
+            raise MultipartParseError("Body ended before the closing boundary")
+    except Exception as e:
+        for writer in writers:
+            writer.discard()
+        if isinstance(e, MultipartParseError):
+            raise UploadError(f"Malformed multipart body: {str(e)}") from e
+        raise
+
+    if not writers:
+        raise UploadError(f"No file found in form field '{field_name}'")
+
+    writer = writers[0]
+    video_path = writer.commit()
+    return {
+        "video_path": video_path,
+        "video_hash": writer.hexdigest,
+        "original_filename": writer.filename,
+        "size": writer.size
+    }
+
+def link_or_reference(src: Path, dst: str) -> str:
+    """
+    Makes src available at dst without copying it.
+
+    Hardlinks when possible and otherwise returns src itself for callers to read in place.
+    """
+    try:
+        os.link(src, dst)
+        return dst
+    except OSError:
+        return str(src)
@@ -0,0 +1,213 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.config import MEDIA_WORKERS
+
+# Number of jobs that run at once, and how many finished jobs are kept for status lookups.
+# By default there are at least as many jobs as media workers, so a batch can keep every
+# worker process busy
+JOB_WORKERS = int(os.getenv("PEAR_JOB_WORKERS", max(2, MEDIA_WORKERS)))
+MAX_FINISHED_JOBS = int(os.getenv("PEAR_MAX_FINISHED_JOBS", 100))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled."""
+
+class Job:
+    """
+    A unit of background work with per-stage progress.
+
+    The job function receives the Job and should call set_stage() as it moves through
+    its stages; cancellation takes effect at the next stage boundary. Jobs created with
+    stream_events set also pass partial results to emit(), read by one consumer with
+    events() in a thread or events_async() in the event loop.
+    """
+    def __init__(self, job_id: str, stages: List[str], stream_events: bool = False):
+        self.id = job_id
+        self.stages = list(stages)
+        self.status = QUEUED
+        self.stage = None
+        self.completed_stages = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future: Optional[Future] = None
+        self._cancelled = threading.Event()
+        # Only kept for jobs someone is streaming, so other jobs do not hold their events
+        self._events: Optional["queue.Queue[Optional[Dict[str, Any]]]"] = queue.Queue() if stream_events else None
+        # Set while events_async() is reading, so events go straight to its loop instead
+        self._async_events: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = None
+        self._events_lock = threading.Lock()
+
+    def set_stage(self, stage: str) -> None:
+        self.check_cancelled()
+        if self.stage is not None:
+            self.completed_stages.append(self.stage)
+        self.stage = stage
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        """Publishes a partial result to the job's event stream, if it has one."""
+        if self._events is not None:
+            self._publish(event)
+
+    def _publish(self, event: Optional[Dict[str, Any]]) -> None:
+        with self._events_lock:
+            if self._async_events is None:
+                self._events.put(event)
+                return
+            loop, events = self._async_events
+            try:
+                loop.call_soon_threadsafe(events.put_nowait, event)
+            except RuntimeError:
+                # The reader's loop has closed; nobody is listening any more
+                pass
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        """Yields the job's events as they are emitted, until the job finishes."""
+        if self._events is None:
+            return
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            yield event
+
+    async def events_async(self) -> AsyncIterator[Dict[str, Any]]:
+        """Like events(), but waits in the running event loop instead of blocking a thread."""
+        if self._events is None:
+            return
+        events: asyncio.Queue = asyncio.Queue()
+        with self._events_lock:
+            # Hand over whatever was emitted before the reader arrived
+            while True:
+                try:
+                    events.put_nowait(self._events.get_nowait())
+                except queue.Empty:
+                    break
+            self._async_events = (asyncio.get_running_loop(), events)
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            with self._events_lock:
+                self._async_events = None
+
+    def check_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def cancel(self) -> bool:
+        """Requests cancellation. Returns False if the job has already finished."""
+        if self.status in FINISHED_STATUSES:
+            return False
+        self._cancelled.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+        return True
+
+    def progress(self) -> float:
+        if self.status == SUCCEEDED:
+            return 1.0
+        if not self.stages:
+            return 0.0
+        return len(self.completed_stages) / len(self.stages)
+
+    def _finish(self, status: str, result: Any = None, error: str = None) -> None:
+        if self.stage is not None and status == SUCCEEDED:
+            self.completed_stages.append(self.stage)
+            self.stage = None
+        # Everything else is set before the status, which other threads read to see that the job is done
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.status = status
+        if self._events is not None:
+            self._publish(None)
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "completed_stages": list(self.completed_stages),
+            "stages": list(self.stages),
+            "progress": round(self.progress(), 3),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+class JobQueue:
+    """
+    In-memory job queue backed by a bounded thread pool.
+    """
+    def __init__(self, max_workers: int = JOB_WORKERS, max_finished_jobs: int = MAX_FINISHED_JOBS):
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., Any], *args, stages: List[str] = (),
+               stream_events: bool = False, **kwargs) -> Job:
+        """Queues func(job, *args, **kwargs) and returns the Job immediately."""
+        job = Job(uuid.uuid4().hex, stages, stream_events)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        return job is not None and job.cancel()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job, func: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.check_cancelled()
+            result = func(job, *args, **kwargs)
+            job._finish(SUCCEEDED, result=result)
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            print(f"Job {job.id} failed: {str(e)}")
+            traceback.print_exc()
+            job._finish(FAILED, error=str(e))
+
+    def _prune(self) -> None:
+        """Forgets the oldest finished jobs beyond max_finished_jobs."""
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATUSES]
+        excess = len(finished) - self.max_finished_jobs
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j.finished_at or 0)[:excess]:
+                del self._jobs[job.id]
@@ -0,0 +1,208 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Histogram buckets in seconds, from quick local steps up to multi-minute agent runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    """A monotonically increasing value per label set, rendered in Prometheus text format."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in sorted(self._values.items())]
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in Prometheus text format."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            # One slot per bucket, then the running sum and count
+            state = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state):
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "pear_stage_duration_seconds", "Wall time of pipeline and agent stages.", ["stage"]))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "pear_stage_errors_total", "Stages that raised an exception.", ["stage"]))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "pear_llm_requests_total", "OpenAI requests by outcome (ok, error or cached).", ["model", "operation", "status"]))
+LLM_DURATION = REGISTRY.register(Histogram(
+    "pear_llm_request_duration_seconds", "OpenAI request latency including retries.", ["model", "operation"]))
+LLM_RETRIES = REGISTRY.register(Counter(
+    "pear_llm_retries_total", "OpenAI requests retried after a rate limit.", ["model", "operation"]))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "pear_llm_tokens_total", "Tokens reported in OpenAI usage.", ["model", "kind"]))
+VISION_BYTES = REGISTRY.register(Counter(
+    "pear_vision_payload_bytes_total", "Screenshot bytes before (original) and after (sent) frame preparation.", ["kind"]))
+VISION_TOKENS = REGISTRY.register(Counter(
+    "pear_vision_estimated_tokens_total", "Estimated image tokens before (original) and after (sent) frame preparation.", ["kind"]))
+AUDIO_SECONDS = REGISTRY.register(Counter(
+    "pear_transcription_audio_seconds_total", "Audio seconds before (original) and after (sent) voice-activity trimming.", ["kind"]))
+TRACE_TOKENS = REGISTRY.register(Counter(
+    "pear_prompt_trace_tokens_total", "Trace tokens per prompt before (original) and after (sent) compaction.", ["kind"]))
+
+# Timing entries for the request currently being handled, if it asked for a breakdown
+_timings: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("pear_timings", default=None)
+
+@contextmanager
+def collect_timings() -> Iterator[List[Dict[str, Any]]]:
+    """Collects the spans and LLM calls recorded in this context (and tasks started from it)."""
+    timings = []
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+def _record_timing(entry: Dict[str, Any]) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings.append(entry)
+
+@contextmanager
+def span(stage: str, **attributes) -> Iterator[Dict[str, Any]]:
+    """
+    Times a stage into the stage histogram and the current timing breakdown.
+
+    Yields the attribute dict so the stage can attach details such as item counts.
+    """
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        attributes["error"] = True
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, stage=stage)
+        _record_timing({"stage": stage, "duration": round(duration, 4), **attributes})
+
+def record_llm_call(model: str, operation: str, duration: float, status: str = "ok",
+                    usage: Any = None, retries: int = 0) -> None:
+    """Records one OpenAI request, including its token usage and how often it was retried."""
+    LLM_REQUESTS.inc(model=model, operation=operation, status=status)
+    if status != "cached":
+        LLM_DURATION.observe(duration, model=model, operation=operation)
+    if retries:
+        LLM_RETRIES.inc(retries, model=model, operation=operation)
+
+    entry = {"stage": f"llm.{operation}", "model": model, "duration": round(duration, 4), "status": status}
+    if retries:
+        entry["retries"] = retries
+    if usage is not None:
+        tokens = {
+            kind: getattr(usage, f"{kind}_tokens", None)
+            for kind in ("prompt", "completion")
+        }
+        for kind, count in tokens.items():
+            if count:
+                LLM_TOKENS.inc(count, model=model, kind=kind)
+        entry["tokens"] = {kind: count for kind, count in tokens.items() if count is not None}
+    _record_timing(entry)
+
+def record_vision_payload(original_bytes: int, sent_bytes: int, original_tokens: int, sent_tokens: int) -> None:
+    """Records how much a prepared screenshot saved in upload size and estimated image tokens."""
+    VISION_BYTES.inc(original_bytes, kind="original")
+    VISION_BYTES.inc(sent_bytes, kind="sent")
+    VISION_TOKENS.inc(original_tokens, kind="original")
+    VISION_TOKENS.inc(sent_tokens, kind="sent")
+    _record_timing({
+        "stage": "vision_payload",
+        "bytes_saved": original_bytes - sent_bytes,
+        "tokens_saved": original_tokens - sent_tokens
+    })
+
+def record_audio_payload(original_seconds: float, sent_seconds: float, speech_segments: int) -> None:
+    """Records how much audio voice-activity detection kept out of a transcription request."""
+    AUDIO_SECONDS.inc(original_seconds, kind="original")
+    AUDIO_SECONDS.inc(sent_seconds, kind="sent")
+    _record_timing({
+        "stage": "vad",
+        "speech_segments": speech_segments,
+        "seconds_saved": round(original_seconds - sent_seconds, 3)
+    })
+
+def record_trace_compaction(original_tokens: int, compacted_tokens: int, prompts: int = 1) -> None:
+    """Records the trace tokens saved by compaction, once for every prompt the trace is pasted into."""
+    TRACE_TOKENS.inc(original_tokens * prompts, kind="original")
+    TRACE_TOKENS.inc(compacted_tokens * prompts, kind="sent")
+    _record_timing({
+        "stage": "trace_compaction",
+        "prompts": prompts,
+        "tokens_saved_per_prompt": original_tokens - compacted_tokens
+    })
+
+def render_metrics() -> str:
+    return REGISTRY.render()
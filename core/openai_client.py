@@ -0,0 +1,101 @@
+import asyncio
+import contextvars
+import os
+import threading
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Iterator, Optional, Tuple, Type
+
+from core.rate_limit import TokenBucket
+
+if TYPE_CHECKING:
+    # The SDK takes the best part of a second to import, so it is loaded with the first client
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+# Request rate shared by every OpenAI call in the process, across all jobs
+OPENAI_REQUESTS_PER_SECOND = float(os.getenv("PEAR_OPENAI_RPS", 4.0))
+OPENAI_BURST = float(os.getenv("PEAR_OPENAI_BURST", OPENAI_REQUESTS_PER_SECOND))
+# Retries for a failed request. The SDK's own retries are off, so that every attempt
+# (first or retried) takes a token from the shared limiter and shows up in the metrics
+OPENAI_MAX_RETRIES = int(os.getenv("PEAR_OPENAI_MAX_RETRIES", 5))
+# Size of the HTTP connection pool behind each client
+OPENAI_MAX_CONNECTIONS = int(os.getenv("PEAR_OPENAI_MAX_CONNECTIONS", 20))
+
+_client: Optional["OpenAI"] = None
+_async_client: Optional["AsyncOpenAI"] = None
+_limiter: Optional[TokenBucket] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+def _limits() -> "httpx.Limits":
+    import httpx
+    return httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS)
+
+def get_openai_client() -> "OpenAI":
+    """Returns the process-wide synchronous client, creating it on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            from openai import DefaultHttpxClient, OpenAI
+            _client = OpenAI(http_client=DefaultHttpxClient(limits=_limits()), max_retries=0)
+        return _client
+
+def get_async_openai_client() -> "AsyncOpenAI":
+    """
+    Returns the process-wide async client. Its connection pool belongs to the shared
+    event loop, so only await it from coroutines started with run_async().
+    """
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            _async_client = AsyncOpenAI(http_client=DefaultAsyncHttpxClient(limits=_limits()), max_retries=0)
+        return _async_client
+
+def get_openai_limiter() -> TokenBucket:
+    """Returns the token bucket every OpenAI request takes a token from before it is sent."""
+    global _limiter
+    with _lock:
+        if _limiter is None:
+            _limiter = TokenBucket(OPENAI_REQUESTS_PER_SECOND, OPENAI_BURST)
+        return _limiter
+
+def retryable_errors() -> Tuple[Type[BaseException], ...]:
+    """The errors the SDK would have retried itself: rate limits, connection failures and 5xx responses."""
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+    return (RateLimitError, APIConnectionError, InternalServerError)
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="openai-loop", daemon=True).start()
+        return _loop
+
+async def _run_in_context(coro: Awaitable[Any], context: contextvars.Context) -> Any:
+    # The task copies the caller's context, so timings and spans are recorded for the caller
+    return await context.run(asyncio.ensure_future, coro)
+
+def run_async(coro: Awaitable[Any]) -> Any:
+    """
+    Runs a coroutine on the shared event loop from a worker thread and waits for its result.
+
+    Concurrent jobs all run their async OpenAI calls on this one loop, so they share one
+    connection pool instead of each opening its own with asyncio.run().
+    """
+    context = contextvars.copy_context()
+    return asyncio.run_coroutine_threadsafe(_run_in_context(coro, context), _get_loop()).result()
+
+def iter_async(iterator: AsyncIterator[Any]) -> Iterator[Any]:
+    """
+    Iterates an async generator on the shared event loop from a worker thread, handing
+    each item over as soon as it is produced.
+    """
+    try:
+        while True:
+            try:
+                yield run_async(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_async(iterator.aclose())
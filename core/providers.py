@@ -0,0 +1,141 @@
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Taken when the app starts importing its modules (main imports this first)
+PROCESS_START = time.perf_counter()
+
+class Provider:
+    """
+    A heavy component (a module with expensive imports, an API client, a browser pool)
+    that is only loaded the first time it is used.
+
+    warm runs extra set-up that is worth doing ahead of the first request, such as
+    launching browsers; close is called on shutdown if the component was ever loaded.
+    """
+    def __init__(self, name: str, load: Callable[[], Any],
+                 warm: Callable[[Any], None] = None, close: Callable[[Any], None] = None):
+        self.name = name
+        self._load = load
+        self._warm = warm
+        self._close = close
+        self.value: Any = None
+        self.loaded = False
+        self.warmed = False
+        self.load_seconds: Optional[float] = None
+        self.warm_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        if self.loaded:
+            return self.value
+        with self._lock:
+            if not self.loaded:
+                start = time.perf_counter()
+                try:
+                    self.value = self._load()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.loaded = True
+                self.error = None
+                print(f"Loaded {self.name} in {self.load_seconds:.2f}s")
+        return self.value
+
+    def warm(self) -> None:
+        value = self.get()
+        with self._lock:
+            if self.warmed or self._warm is None:
+                self.warmed = True
+                return
+            start = time.perf_counter()
+            try:
+                self._warm(value)
+            except Exception as e:
+                self.error = str(e)
+                raise
+            self.warm_seconds = round(time.perf_counter() - start, 3)
+            self.warmed = True
+            self.error = None
+            print(f"Warmed {self.name} in {self.warm_seconds:.2f}s")
+
+    def close(self) -> None:
+        if self.loaded and self._close is not None:
+            self._close(self.value)
+
+    def status(self) -> Dict[str, Any]:
+        status = {"loaded": self.loaded, "warmed": self.warmed,
+                  "load_seconds": self.load_seconds, "warm_seconds": self.warm_seconds}
+        if self.error:
+            status["error"] = self.error
+        return status
+
+_providers: Dict[str, Provider] = {}
+_started: Optional[float] = None
+
+def register(name: str, load: Callable[[], Any], warm: Callable[[Any], None] = None,
+             close: Callable[[Any], None] = None) -> Provider:
+    _providers[name] = Provider(name, load, warm, close)
+    return _providers[name]
+
+def register_module(name: str, module: str, warm: Callable[[Any], None] = None,
+                    close: Callable[[Any], None] = None, requires: Iterable[str] = ()) -> Provider:
+    """Registers a component whose value is a module, imported on first use (after the ones it requires)."""
+    def load():
+        for required in requires:
+            get_component(required)
+        return importlib.import_module(module)
+    return register(name, load, warm, close)
+
+def get_component(name: str) -> Any:
+    """Returns a registered component, loading it on first use."""
+    return _providers[name].get()
+
+def warm_components(names: Iterable[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Loads and warms the named components (all of them if names is None), carrying on
+    past failures. Returns the status of each.
+    """
+    names = list(_providers) if names is None else list(names)
+    statuses = {}
+    for name in names:
+        provider = _providers.get(name)
+        if provider is None:
+            statuses[name] = {"loaded": False, "error": "Unknown component"}
+            continue
+        try:
+            provider.warm()
+        except Exception as e:
+            print(f"Could not warm {name}: {str(e)}")
+        statuses[name] = provider.status()
+    return statuses
+
+def close_components() -> None:
+    """Closes every loaded component, most recently registered first."""
+    for provider in reversed(list(_providers.values())):
+        try:
+            provider.close()
+        except Exception as e:
+            print(f"Error while closing {provider.name}: {str(e)}")
+
+def component_names() -> List[str]:
+    return list(_providers)
+
+def mark_started() -> Dict[str, Any]:
+    """Records that the app finished starting and prints the startup report."""
+    global _started
+    _started = time.perf_counter()
+    report = startup_report()
+    deferred = [name for name, status in report["components"].items() if not status["loaded"]]
+    print(f"Started in {report['startup_seconds']:.2f}s; deferred: {', '.join(deferred) or 'nothing'}")
+    return report
+
+def startup_report() -> Dict[str, Any]:
+    return {
+        "startup_seconds": None if _started is None else round(_started - PROCESS_START, 3),
+        "uptime_seconds": round(time.perf_counter() - PROCESS_START, 3),
+        "components": {name: provider.status() for name, provider in _providers.items()}
+    }
@@ -0,0 +1,95 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Tuple, Type
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter usable from coroutines and threads alike.
+
+    Each acquire reserves a token up front and then waits until it is due, so
+    callers never hold the lock while sleeping and the bucket is not tied to a
+    particular event loop.
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self) -> None:
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self) -> None:
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 30.0) -> float:
+    """Exponential backoff with full jitter for the given (zero-based) retry attempt."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+async def call_with_retries(func: Callable[..., Awaitable[Any]], *args,
+                            retry_on: Tuple[Type[BaseException], ...] = (),
+                            max_retries: int = 5,
+                            base_delay: float = 1.0,
+                            limiter: TokenBucket = None,
+                            on_retry: Callable[[int, BaseException], None] = None,
+                            **kwargs) -> Any:
+    """
+    Awaits func(*args, **kwargs), retrying with backoff on the given exception types.
+
+    If a limiter is given, a token is taken before every attempt, including retries.
+    on_retry is called with the attempt number and the error before each retry.
+    """
+    attempt = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            return await func(*args, **kwargs)
+        except retry_on as e:
+            if attempt >= max_retries:
+                raise
+            if on_retry is not None:
+                on_retry(attempt + 1, e)
+            delay = backoff_delay(attempt, base_delay)
+            print(f"Retrying after {type(e).__name__} (attempt {attempt + 1} of {max_retries}) in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+def call_with_retries_sync(func: Callable[..., Any], *args,
+                           retry_on: Tuple[Type[BaseException], ...] = (),
+                           max_retries: int = 5,
+                           base_delay: float = 1.0,
+                           limiter: TokenBucket = None,
+                           on_retry: Callable[[int, BaseException], None] = None,
+                           **kwargs) -> Any:
+    """Blocking counterpart of call_with_retries for callers in worker threads."""
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire_sync()
+        try:
+            return func(*args, **kwargs)
+        except retry_on as e:
+            if attempt >= max_retries:
+                raise
+            if on_retry is not None:
+                on_retry(attempt + 1, e)
+            delay = backoff_delay(attempt, base_delay)
+            print(f"Retrying after {type(e).__name__} (attempt {attempt + 1} of {max_retries}) in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
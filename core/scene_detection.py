@@ -0,0 +1,71 @@
+import numpy as np
+from PIL import Image
+from typing import List, Tuple
+
+# Size frames are reduced to before pixel comparison (width, height)
+DIFF_SIZE = (64, 36)
+# dHash grid: compares HASH_SIZE + 1 columns per row, yielding HASH_SIZE**2 bits
+HASH_SIZE = 8
+
+# A pixel counts as changed when its grayscale value moves by more than this (0-1 scale)
+PIXEL_DELTA = 0.1
+# The screen changed if more than this fraction of pixels changed...
+CHANGED_FRACTION = 0.05
+# ...or if the perceptual hashes differ by at least this many bits
+HASH_DISTANCE = 10
+
+def load_frames(image_paths: List[str], size: Tuple[int, int] = DIFF_SIZE) -> np.ndarray:
+    """
+    Loads frames as a (N, height, width) stack of downsampled grayscale arrays in [0, 1].
+    """
+    frames = np.empty((len(image_paths), size[1], size[0]), dtype=np.float32)
+    for i, image_path in enumerate(image_paths):
+        with Image.open(image_path) as image:
+            frames[i] = np.asarray(image.convert("L").resize(size, Image.BILINEAR), dtype=np.float32)
+    return frames / 255.0
+
+def dhash(frames: np.ndarray, hash_size: int = HASH_SIZE) -> np.ndarray:
+    """
+    Computes difference hashes for a stack of frames, returned as (N, hash_size**2) booleans.
+    """
+    n, height, width = frames.shape
+    # Block-average each frame down to the (hash_size, hash_size + 1) hash grid
+    rows = np.linspace(0, height, hash_size + 1).astype(int)
+    cols = np.linspace(0, width, hash_size + 2).astype(int)
+    grid = np.add.reduceat(np.add.reduceat(frames, rows[:-1], axis=1), cols[:-1], axis=2)
+    grid /= np.outer(np.diff(rows), np.diff(cols))
+    return (grid[:, :, 1:] > grid[:, :, :-1]).reshape(n, -1)
+
+def frame_differences(frames: np.ndarray, pixel_delta: float = PIXEL_DELTA) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compares each frame with the one before it.
+
+    Returns the fraction of changed pixels and the hash distance for every consecutive pair.
+    """
+    if len(frames) < 2:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    changed_fraction = (np.abs(frames[1:] - frames[:-1]) > pixel_delta).mean(axis=(1, 2))
+    hashes = dhash(frames)
+    hash_distance = (hashes[1:] != hashes[:-1]).sum(axis=1)
+    return changed_fraction, hash_distance
+
+def detect_screen_changes(image_paths: List[str],
+                          changed_fraction: float = CHANGED_FRACTION,
+                          hash_distance: int = HASH_DISTANCE,
+                          pixel_delta: float = PIXEL_DELTA) -> List[Tuple[int, int]]:
+    """
+    Splits a sequence of frames into screens.
+
+    Returns inclusive (first_index, last_index) pairs, one per detected screen.
+    """
+    if not image_paths:
+        return []
+
+    frames = load_frames(image_paths)
+    fractions, distances = frame_differences(frames, pixel_delta)
+    changed = (fractions > changed_fraction) | (distances >= hash_distance)
+
+    # Frame i + 1 starts a new screen wherever pair (i, i + 1) changed
+    starts = np.concatenate(([0], np.flatnonzero(changed) + 1))
+    ends = np.concatenate((starts[1:] - 1, [len(image_paths) - 1]))
+    return [(int(start), int(end)) for start, end in zip(starts, ends)]
@@ -0,0 +1,242 @@
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.cache import hash_file
+from core.ingest import UPLOAD_DIR
+from core.workflow import Workflow
+
+# Which WorkflowStore implementation get_workflow_store() opens: "sqlite" or "supabase"
+STORE_BACKEND = os.getenv("PEAR_STORE_BACKEND", "sqlite")
+# Local store: the SQLite index and the directory frames are copied into
+STORE_PATH = os.getenv("PEAR_STORE_PATH", "data/store/workflows.sqlite3")
+FRAMES_DIR = os.getenv("PEAR_STORE_FRAMES_DIR", "data/store/frames")
+
+class WorkflowStore(ABC):
+    """
+    Stores generated workflows, their frames and transcripts, keyed by the SHA-256
+    of the source video.
+
+    A stored workflow is a dict with workflow_id, video_hash, video_filename,
+    created_at and workflow_data (the same step list /create_new_workflow returns).
+    """
+    @abstractmethod
+    def save_workflow(self, video_hash: str, workflow: Workflow, transcript: List[Dict[str, Any]] = None,
+                      video_filename: str = None) -> Dict[str, Any]:
+        """Persists the workflow, its frames and transcript, replacing any earlier one for the video."""
+
+    @abstractmethod
+    def get_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a stored workflow by its id."""
+
+    @abstractmethod
+    def find_workflow(self, video_hash: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored workflow for a video, if it has been processed before."""
+
+    @abstractmethod
+    def get_transcript(self, video_hash: str) -> Optional[List[Dict[str, Any]]]:
+        """Returns the word-level transcript stored with a video's workflow."""
+
+    @abstractmethod
+    def save_fingerprint(self, video_hash: str, fingerprint: Dict[str, Any]) -> None:
+        """Stores the frame and audio fingerprints used to diff later versions of a recording."""
+
+    @abstractmethod
+    def recent_fingerprints(self, limit: int = 20) -> List[Tuple[str, Dict[str, Any]]]:
+        """Returns (video_hash, fingerprint) pairs for the most recently processed videos."""
+
+    def steps_between(self, workflow_id: str, start: float, end: float) -> List[Dict[str, Any]]:
+        """Returns the steps of a stored workflow whose intervals overlap [start, end]."""
+        stored = self.get_workflow(workflow_id)
+        if stored is None:
+            return []
+        workflow = Workflow.from_workflow_data(stored["workflow_data"])
+        return [node.to_dict() for node in workflow.steps_between(start, end)]
+
+class SQLiteWorkflowStore(WorkflowStore):
+    """
+    Local store for development and tests: workflows, steps and transcripts in SQLite,
+    frames copied to a directory per video hash.
+    """
+    def __init__(self, path: str = STORE_PATH, frames_dir: str = FRAMES_DIR):
+        self.path = path
+        self.frames_dir = frames_dir
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS workflows ("
+            "id TEXT PRIMARY KEY, video_hash TEXT NOT NULL UNIQUE, video_filename TEXT, "
+            "data TEXT NOT NULL, created REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS steps ("
+            "workflow_id TEXT NOT NULL, position INTEGER NOT NULL, start REAL, end REAL, "
+            "screenshot TEXT NOT NULL, PRIMARY KEY (workflow_id, position));"
+            "CREATE INDEX IF NOT EXISTS steps_interval ON steps (workflow_id, start, end);"
+            "CREATE TABLE IF NOT EXISTS transcripts (video_hash TEXT PRIMARY KEY, words TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "video_hash TEXT PRIMARY KEY, data TEXT NOT NULL, created REAL NOT NULL);"
+        )
+        self._conn.commit()
+
+    def _store_frames(self, video_hash: str, workflow: Workflow) -> List[Dict[str, Any]]:
+        """Copies each step's screenshot into the frames directory and points the step at the copy."""
+        frame_dir = os.path.join(self.frames_dir, video_hash)
+        os.makedirs(frame_dir, exist_ok=True)
+        steps = workflow.to_workflow_data()
+        for i, step in enumerate(steps):
+            source = step["screenshot"]
+            if not os.path.exists(source):
+                continue
+            # Named by position: steps spliced from an earlier version can share a source file name
+            destination = os.path.join(frame_dir, f"step{i:04d}{os.path.splitext(source)[1]}")
+            if os.path.abspath(source) != os.path.abspath(destination):
+                shutil.copyfile(source, destination)
+            step["screenshot"] = destination
+        return steps
+
+    def save_workflow(self, video_hash: str, workflow: Workflow, transcript: List[Dict[str, Any]] = None,
+                      video_filename: str = None) -> Dict[str, Any]:
+        steps = self._store_frames(video_hash, workflow)
+        stored = {
+            "workflow_id": uuid.uuid4().hex,
+            "video_hash": video_hash,
+            "video_filename": video_filename,
+            "created_at": time.time(),
+            "workflow_data": steps
+        }
+        with self._lock:
+            previous = self._conn.execute("SELECT id FROM workflows WHERE video_hash = ?", (video_hash,)).fetchone()
+            if previous is not None:
+                self._conn.execute("DELETE FROM steps WHERE workflow_id = ?", previous)
+                self._conn.execute("DELETE FROM workflows WHERE id = ?", previous)
+            self._conn.execute(
+                "INSERT INTO workflows (id, video_hash, video_filename, data, created) VALUES (?, ?, ?, ?, ?)",
+                (stored["workflow_id"], video_hash, video_filename, json.dumps(steps), stored["created_at"])
+            )
+            self._conn.executemany(
+                "INSERT INTO steps (workflow_id, position, start, end, screenshot) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (stored["workflow_id"], i, step["interval"]["start"], step["interval"]["end"], step["screenshot"])
+                    for i, step in enumerate(steps)
+                ]
+            )
+            if transcript is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO transcripts (video_hash, words) VALUES (?, ?)",
+                    (video_hash, json.dumps(transcript))
+                )
+            self._conn.commit()
+        return stored
+
+    def _row_to_workflow(self, row: Optional[Tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        workflow_id, video_hash, video_filename, data, created = row
+        return {
+            "workflow_id": workflow_id,
+            "video_hash": video_hash,
+            "video_filename": video_filename,
+            "created_at": created,
+            "workflow_data": json.loads(data)
+        }
+
+    def get_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, video_hash, video_filename, data, created FROM workflows WHERE id = ?", (workflow_id,)
+            ).fetchone()
+        return self._row_to_workflow(row)
+
+    def find_workflow(self, video_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, video_hash, video_filename, data, created FROM workflows WHERE video_hash = ?", (video_hash,)
+            ).fetchone()
+        return self._row_to_workflow(row)
+
+    def get_transcript(self, video_hash: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT words FROM transcripts WHERE video_hash = ?", (video_hash,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def save_fingerprint(self, video_hash: str, fingerprint: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (video_hash, data, created) VALUES (?, ?, ?)",
+                (video_hash, json.dumps(fingerprint), time.time())
+            )
+            self._conn.commit()
+
+    def recent_fingerprints(self, limit: int = 20) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_hash, data FROM fingerprints ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [(video_hash, json.loads(data)) for video_hash, data in rows]
+
+    def steps_between(self, workflow_id: str, start: float, end: float) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT position FROM steps WHERE workflow_id = ? AND start <= ? AND (end IS NULL OR end >= ?) "
+                "ORDER BY position",
+                (workflow_id, end, start)
+            ).fetchall()
+            if not rows:
+                return []
+            data = self._conn.execute("SELECT data FROM workflows WHERE id = ?", (workflow_id,)).fetchone()
+        steps = json.loads(data[0])
+        return [steps[position] for (position,) in rows]
+
+# Names of content-addressed uploads: the SHA-256 of the file
+CONTENT_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+# Video hashes by (path, size, mtime), so repeat requests for the same file skip rehashing
+_video_hashes: Dict[Tuple[str, int, int], str] = {}
+_video_hashes_lock = threading.Lock()
+
+def video_hash(path: str) -> str:
+    """
+    Returns the SHA-256 of a video file, reusing the last result while the file is unchanged.
+
+    Uploads are stored under their SHA-256 (see core.ingest), so their name is used as is.
+    """
+    if os.path.dirname(os.path.abspath(path)) == os.path.abspath(UPLOAD_DIR):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if CONTENT_HASH_PATTERN.match(name):
+            return name
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _video_hashes_lock:
+        cached = _video_hashes.get(key)
+    if cached is not None:
+        return cached
+    digest = hash_file(path)
+    with _video_hashes_lock:
+        _video_hashes[key] = digest
+    return digest
+
+_store: Optional[WorkflowStore] = None
+_store_lock = threading.Lock()
+
+def get_workflow_store() -> WorkflowStore:
+    """Returns the process-wide workflow store for the configured backend, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if STORE_BACKEND == "supabase":
+                from controllers.db_controller import SupabaseWorkflowStore
+                _store = SupabaseWorkflowStore()
+            elif STORE_BACKEND == "sqlite":
+                _store = SQLiteWorkflowStore()
+            else:
+                raise ValueError(f"Unknown workflow store backend: {STORE_BACKEND}")
+        return _store
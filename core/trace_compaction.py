@@ -0,0 +1,244 @@
+import json
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Compact traces before they are pasted into prompts, and the token budget they are fitted to
+TRACE_COMPACTION_ENABLED = os.getenv("PEAR_TRACE_COMPACTION", "1") == "1"
+TRACE_TOKEN_BUDGET = int(os.getenv("PEAR_TRACE_TOKEN_BUDGET", 1500))
+
+# Bookkeeping fields and file references that say nothing about what the user did
+DROP_FIELDS = {"screenshot", "screenshot_path", "image_path", "path", "file_path",
+               "video_url", "video_filename", "video_hash", "workflow_id",
+               "status", "stored", "timings", "created_at", "reused_steps"}
+# Lists of steps are looked for under these keys of a top-level object
+STEP_LIST_KEYS = ("workflow_data", "actions", "steps")
+
+# Word n-gram size for spotting repeated sentences
+SHINGLE_SIZE = 3
+# Adjacent steps whose word-pair shingles overlap at least this much (Jaccard) are merged.
+# Pairs rather than triples, since model-written summaries of the same screen vary their phrasing
+MERGE_SHINGLE_SIZE = 2
+MERGE_SIMILARITY = 0.5
+# A sentence is dropped when this fraction of its shingles already appeared in earlier steps
+REPEAT_CONTAINMENT = 0.8
+
+# Sentence limits tried in turn, per text field, until the trace fits its budget
+SENTENCE_LIMITS = (None, 4, 2, 1)
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+# Inline data URIs are always dropped; other values only when they name a file on this machine,
+# so XPaths ("//button") and relative URLs ("/new") survive
+DATA_URI_PATTERN = re.compile(r"^data:")
+
+_encoding = None
+
+def estimate_tokens(text: str) -> int:
+    """Counts tokens with tiktoken when it is installed, otherwise estimates ~4 characters per token."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[Tuple[str, ...]]:
+    """Returns the set of lowercase word n-grams in text (the words themselves for short text)."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def jaccard(a: Set, b: Set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+
+def _is_file_reference(value: str) -> bool:
+    if DATA_URI_PATTERN.match(value):
+        return True
+    return len(value) < 4096 and os.path.isabs(value) and os.path.isfile(value)
+
+def _strip_step(step: Any) -> Any:
+    """Drops bookkeeping fields and file references, and flattens intervals to [start, end]."""
+    if not isinstance(step, dict):
+        return step
+    stripped = {}
+    for key, value in step.items():
+        if key in DROP_FIELDS or (isinstance(value, str) and _is_file_reference(value)):
+            continue
+        if key == "interval" and isinstance(value, dict):
+            value = [value.get("start"), value.get("end")]
+        if isinstance(value, str):
+            value = value.strip()
+        stripped[key] = value
+    return stripped
+
+def _step_text(step: Any) -> str:
+    if isinstance(step, dict):
+        return " ".join(value for value in step.values() if isinstance(value, str))
+    return str(step)
+
+def _merge_steps(steps: List[Any]) -> List[Any]:
+    """Merges runs of adjacent steps whose text is nearly the same, keeping the later text."""
+    merged = []
+    previous_shingles = None
+    for step in steps:
+        step_shingles = shingles(_step_text(step), MERGE_SHINGLE_SIZE)
+        if merged and previous_shingles is not None and jaccard(step_shingles, previous_shingles) >= MERGE_SIMILARITY:
+            last = merged[-1]
+            if isinstance(last, dict) and isinstance(step, dict):
+                combined = dict(step)
+                if isinstance(last.get("interval"), list) and isinstance(step.get("interval"), list):
+                    combined["interval"] = [last["interval"][0], step["interval"][1]]
+                merged[-1] = combined
+            else:
+                merged[-1] = step
+        else:
+            merged.append(step)
+        previous_shingles = step_shingles
+    return merged
+
+def _dedupe_text(steps: List[Any]) -> List[Any]:
+    """
+    Removes sentences from each step's text fields that mostly repeat text already seen in
+    the same field of earlier steps (e.g. the full transcript pasted into every step).
+    """
+    seen: Dict[str, Set[Tuple[str, ...]]] = {}
+    deduped = []
+    for step in steps:
+        if not isinstance(step, dict):
+            deduped.append(step)
+            continue
+        step = dict(step)
+        for key, value in step.items():
+            if not isinstance(value, str):
+                continue
+            field_seen = seen.setdefault(key, set())
+            kept = []
+            for sentence in split_sentences(value):
+                sentence_shingles = shingles(sentence)
+                if sentence_shingles and len(sentence_shingles & field_seen) >= REPEAT_CONTAINMENT * len(sentence_shingles):
+                    continue
+                kept.append(sentence)
+                field_seen |= sentence_shingles
+            step[key] = " ".join(kept)
+        deduped.append({key: value for key, value in step.items() if value != ""})
+    return deduped
+
+def _limit_sentences(steps: List[Any], limit: Optional[int]) -> List[Any]:
+    if limit is None:
+        return steps
+    return [
+        {key: " ".join(split_sentences(value)[:limit]) if isinstance(value, str) else value for key, value in step.items()}
+        if isinstance(step, dict) else step
+        for step in steps
+    ]
+
+def _thin_steps(steps: List[Any], count: int) -> List[Any]:
+    """Keeps count steps spread evenly over the trace, always including the first and last."""
+    if count >= len(steps):
+        return steps
+    if count <= 1:
+        return steps[:1]
+    positions = sorted({round(i * (len(steps) - 1) / (count - 1)) for i in range(count)})
+    return [steps[i] for i in positions]
+
+def _find_steps(trace: Any) -> Tuple[Optional[str], Optional[List[Any]]]:
+    if isinstance(trace, list):
+        return None, trace
+    if isinstance(trace, dict):
+        for key in STEP_LIST_KEYS:
+            if isinstance(trace.get(key), list):
+                return key, trace[key]
+    return None, None
+
+def _longest_text(data: Any) -> int:
+    if isinstance(data, str):
+        return len(data)
+    if isinstance(data, dict):
+        data = list(data.values())
+    if isinstance(data, list):
+        return max((_longest_text(value) for value in data), default=0)
+    return 0
+
+def _truncate_text(data: Any, max_chars: int) -> Any:
+    """Cuts every string in data down to max_chars, keeping the structure intact."""
+    if isinstance(data, str):
+        return data if len(data) <= max_chars else data[:max_chars].rstrip() + "..."
+    if isinstance(data, dict):
+        return {key: _truncate_text(value, max_chars) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_truncate_text(value, max_chars) for value in data]
+    return data
+
+def _dump(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+def compact_trace(trace: str, token_budget: int = TRACE_TOKEN_BUDGET) -> Tuple[str, Dict[str, int]]:
+    """
+    Shrinks a JSON workflow trace before it is pasted into a prompt: strips bookkeeping
+    fields and file paths, merges near-duplicate adjacent steps, removes repeated
+    transcript sentences, then shortens text fields until it fits token_budget.
+
+    Traces that are not JSON are deduplicated by sentence and truncated to the budget.
+    Returns the compacted trace and token counts before and after.
+    """
+    original_tokens = estimate_tokens(trace)
+    try:
+        data = json.loads(trace)
+    except ValueError:
+        data = None
+
+    key, steps = _find_steps(data)
+    structured = None
+    if steps is None:
+        if isinstance(data, dict):
+            structured = _strip_step(data)
+            compacted = _dump(structured)
+        else:
+            compacted = " ".join(_dedupe_text([{"text": trace}])[0].get("text", "").split())
+    else:
+        steps = _dedupe_text(_merge_steps([_strip_step(step) for step in steps]))
+        wrap = (lambda s: s) if key is None else (lambda s: {**_strip_step(data), key: s})
+        for limit in SENTENCE_LIMITS:
+            limited = _limit_sentences(steps, limit)
+            structured = wrap(limited)
+            compacted = _dump(structured)
+            if estimate_tokens(compacted) <= token_budget:
+                break
+        # Still too long: drop steps evenly, keeping the first and last, so the trace stays valid JSON
+        count = len(limited)
+        while count > 1 and estimate_tokens(compacted) > token_budget:
+            # Scale the step count by how far over budget the trace is, removing at least one step
+            count = min(count - 1, max(1, int(count * token_budget / estimate_tokens(compacted))))
+            structured = wrap(_thin_steps(limited, count))
+            compacted = _dump(structured)
+
+    if estimate_tokens(compacted) > token_budget:
+        if structured is None:
+            # Last resort for free text: cut it down to roughly the budget
+            compacted = compacted[:token_budget * 4]
+        else:
+            # A single oversized step (or object) keeps its JSON structure and has its text fields cut
+            max_chars = _longest_text(structured)
+            while max_chars > 0 and estimate_tokens(compacted) > token_budget:
+                max_chars = min(max_chars - 1, int(max_chars * token_budget / estimate_tokens(compacted)))
+                compacted = _dump(_truncate_text(structured, max_chars))
+
+    compacted_tokens = estimate_tokens(compacted)
+    return compacted, {
+        "original_tokens": original_tokens,
+        "compacted_tokens": compacted_tokens,
+        "tokens_saved": max(0, original_tokens - compacted_tokens)
+    }
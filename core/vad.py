@@ -0,0 +1,110 @@
+from typing import List, Tuple
+
+import numpy as np
+
+# Analysis frame length for energy and zero-crossing rate
+FRAME_SECONDS = 0.03
+# A frame is speech when it is this many dB above the recording's noise floor...
+SPEECH_MARGIN_DB = 12.0
+# ...and never when it is quieter than this absolute level (dBFS), e.g. in digital silence.
+# Anything louder than MAX_THRESHOLD_DB always counts, so a steady loud background (or a
+# recording with no pauses) is sent whole rather than dropped
+MIN_SPEECH_DB = -50.0
+MAX_THRESHOLD_DB = -35.0
+# Frames crossing zero more often than this (per sample) are hiss/noise unless clearly loud
+MAX_SPEECH_ZCR = 0.35
+LOUD_MARGIN_DB = 10.0
+# Noise floor estimate: this percentile of frame energies
+NOISE_PERCENTILE = 10
+
+# Pauses shorter than this stay inside a speech segment; shorter bursts are dropped
+MIN_SILENCE_SECONDS = 0.4
+MIN_SPEECH_SECONDS = 0.2
+# Context kept around each segment so word onsets and endings are not clipped
+SPEECH_PADDING_SECONDS = 0.15
+# Silence inserted between segments when they are joined, so Whisper sees a pause
+JOIN_GAP_SECONDS = 0.3
+
+def frame_features(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns per-frame energy in dBFS and zero-crossing rate for mono samples in [-1, 1].
+    """
+    frame = max(1, int(FRAME_SECONDS * sample_rate))
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0), np.zeros(0)
+    frames = samples[:count * frame].astype(np.float64).reshape(count, frame)
+    energy_db = 10 * np.log10(np.square(frames).mean(axis=1) + 1e-12)
+    zcr = (np.diff(np.signbit(frames), axis=1) != 0).mean(axis=1)
+    return energy_db, zcr
+
+def detect_speech(samples: np.ndarray, sample_rate: int) -> List[Tuple[float, float]]:
+    """
+    Finds voiced regions with an energy/zero-crossing detector.
+
+    Returns (start, end) segments in seconds with leading and trailing silence trimmed
+    to SPEECH_PADDING_SECONDS; everything between them is silent.
+    """
+    energy_db, zcr = frame_features(samples, sample_rate)
+    if len(energy_db) == 0:
+        return []
+    threshold = np.clip(np.percentile(energy_db, NOISE_PERCENTILE) + SPEECH_MARGIN_DB, MIN_SPEECH_DB, MAX_THRESHOLD_DB)
+    voiced = (energy_db > threshold) & ((zcr < MAX_SPEECH_ZCR) | (energy_db > threshold + LOUD_MARGIN_DB))
+
+    # Runs of voiced frames as [start, end) frame indices
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    runs = list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+    frame_seconds = max(1, int(FRAME_SECONDS * sample_rate)) / sample_rate
+    segments: List[List[float]] = []
+    for start, end in runs:
+        start, end = start * frame_seconds, end * frame_seconds
+        if segments and start - segments[-1][1] < MIN_SILENCE_SECONDS:
+            segments[-1][1] = end
+        else:
+            segments.append([start, end])
+
+    duration = len(samples) / sample_rate
+    padded = []
+    for start, end in segments:
+        if end - start < MIN_SPEECH_SECONDS:
+            continue
+        start = round(float(max(0.0, start - SPEECH_PADDING_SECONDS)), 3)
+        end = round(float(min(duration, end + SPEECH_PADDING_SECONDS)), 3)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+def join_segments(samples: np.ndarray, sample_rate: int,
+                  segments: List[Tuple[float, float]]) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+    """
+    Concatenates the speech segments, separated by JOIN_GAP_SECONDS of silence.
+
+    Returns the joined samples and a sorted (joined_start, original_start) offset table
+    for remap_times().
+    """
+    gap = np.zeros(int(JOIN_GAP_SECONDS * sample_rate), dtype=samples.dtype)
+    pieces, offsets = [], []
+    position = 0
+    for start, end in segments:
+        piece = samples[int(start * sample_rate):int(end * sample_rate)]
+        if pieces:
+            pieces.append(gap)
+            position += len(gap)
+        offsets.append((position / sample_rate, start))
+        pieces.append(piece)
+        position += len(piece)
+    joined = np.concatenate(pieces) if pieces else np.zeros(0, dtype=samples.dtype)
+    return joined, offsets
+
+def remap_times(times: List[float], offsets: List[Tuple[float, float]]) -> List[float]:
+    """Maps times in the joined audio back to the original recording."""
+    if not offsets:
+        return list(times)
+    joined_starts = np.array([joined for joined, _ in offsets])
+    original_starts = np.array([original for _, original in offsets])
+    times = np.asarray(times, dtype=np.float64)
+    positions = np.maximum(np.searchsorted(joined_starts, times, side="right") - 1, 0)
+    return (original_starts[positions] + times - joined_starts[positions]).round(3).tolist()
@@ -1,24 +1,138 @@
+import bisect
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 class WorkflowNode:
-    def __init__(self, screenshot_id, start_time, end_time, video_url, action_summary, next_screenshot_id=None):
+    """One step of a workflow: a screen, the interval it was shown for, and what happened on it."""
+    __slots__ = ("screenshot_id", "start_time", "end_time", "video_url", "action_summary",
+                 "transcription", "next_screenshot_id", "next")
+
+    def __init__(self, screenshot_id, start_time, end_time, video_url, action_summary,
+                 next_screenshot_id=None, transcription=""):
         self.screenshot_id = screenshot_id
         self.start_time = start_time
         self.end_time = end_time
         self.video_url = video_url
         self.action_summary = action_summary
+        self.transcription = transcription
         self.next_screenshot_id = next_screenshot_id
+        self.next: Optional["WorkflowNode"] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The step in the workflow_data response format."""
+        step = {
+            "screenshot": self.screenshot_id,
+            "interval": {"start": self.start_time, "end": self.end_time},
+            "summary": self.action_summary,
+            "transcription": self.transcription
+        }
+        if self.video_url is not None:
+            step["video_url"] = self.video_url
+        return step
 
 class Workflow:
+    """
+    Ordered workflow steps kept as a linked list, with an id index and an interval
+    index so steps can be looked up by screenshot id or by video time.
+    """
     def __init__(self):
-        self.head = None
-        self.nodes = []
+        self.head: Optional[WorkflowNode] = None
+        self.tail: Optional[WorkflowNode] = None
+        self.nodes: List[WorkflowNode] = []
+        self.by_id: Dict[str, WorkflowNode] = {}
+        # Start times sorted ascending, with the matching nodes at the same positions
+        self._starts: List[float] = []
+        self._by_start: List[WorkflowNode] = []
+
+    def __len__(self) -> int:
+        return len(self.nodes)
 
-    def add_node(self, screenshot_id, start_time, end_time, video_url, action_summary, next_screenshot_id=None):
-        new_node = WorkflowNode(screenshot_id, start_time, end_time, video_url, action_summary, next_screenshot_id)
-        if not self.head:
+    def __iter__(self) -> Iterator[WorkflowNode]:
+        node = self.head
+        while node is not None:
+            yield node
+            node = node.next
+
+    def add_node(self, screenshot_id, start_time, end_time, video_url, action_summary,
+                 next_screenshot_id=None, transcription="") -> WorkflowNode:
+        """Appends a step after the current tail."""
+        if screenshot_id in self.by_id:
+            raise ValueError(f"Duplicate screenshot id in workflow: {screenshot_id}")
+        new_node = WorkflowNode(screenshot_id, start_time, end_time, video_url, action_summary,
+                                next_screenshot_id, transcription)
+        if self.tail is None:
             self.head = new_node
         else:
-            current = self.head
-            while current.next_screenshot_id:
-                current = current.next_screenshot_id
-            current.next_screenshot_id = new_node.screenshot_id
-        self.nodes.append(new_node)
\ No newline at end of file
+            self.tail.next = new_node
+            self.tail.next_screenshot_id = new_node.screenshot_id
+        self.tail = new_node
+        self.nodes.append(new_node)
+        self.by_id[screenshot_id] = new_node
+
+        # Steps normally arrive in time order, so this is an append
+        if not self._starts or start_time >= self._starts[-1]:
+            self._starts.append(start_time)
+            self._by_start.append(new_node)
+        else:
+            position = bisect.bisect_right(self._starts, start_time)
+            self._starts.insert(position, start_time)
+            self._by_start.insert(position, new_node)
+        return new_node
+
+    def get(self, screenshot_id: str) -> Optional[WorkflowNode]:
+        return self.by_id.get(screenshot_id)
+
+    def step_at(self, time: float) -> Optional[WorkflowNode]:
+        """Returns the step whose interval covers the given time in seconds, if any."""
+        position = bisect.bisect_right(self._starts, time) - 1
+        if position < 0:
+            return None
+        node = self._by_start[position]
+        if node.end_time is not None and time > node.end_time:
+            return None
+        return node
+
+    def steps_between(self, start: float, end: float) -> List[WorkflowNode]:
+        """Returns the steps whose intervals overlap [start, end], in time order."""
+        position = max(0, bisect.bisect_right(self._starts, start) - 1)
+        stop = bisect.bisect_right(self._starts, end)
+        return [
+            node for node in self._by_start[position:stop]
+            if node.end_time is None or node.end_time >= start
+        ]
+
+    def to_workflow_data(self) -> List[Dict[str, Any]]:
+        return [node.to_dict() for node in self]
+
+    @classmethod
+    def from_workflow_data(cls, steps: List[Dict[str, Any]]) -> "Workflow":
+        workflow = cls()
+        for step in steps:
+            interval = step.get("interval") or {}
+            workflow.add_node(step["screenshot"], interval.get("start"), interval.get("end"),
+                              step.get("video_url"), step.get("summary", ""),
+                              transcription=step.get("transcription", ""))
+        return workflow
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_workflow_data(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "Workflow":
+        return cls.from_workflow_data(json.loads(data))
+
+    def to_msgpack(self) -> bytes:
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed; use to_json instead")
+        return msgpack.packb(self.to_workflow_data(), use_bin_type=True)
+
+    @classmethod
+    def from_msgpack(cls, data: bytes) -> "Workflow":
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed; use from_json instead")
+        return cls.from_workflow_data(msgpack.unpackb(data, raw=False))
@@ -1,10 +1,33 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+# Imported first, so the startup report covers the time spent importing everything else
+from core import providers
+from core.providers import get_component, register_module
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import asyncio
 import os
 import tempfile
+import threading
 import json
 from pathlib import Path
-from controllers.video_controller import extract_audio, extract_screenshots, group_images, process_video, transcribe_audio_files, combine_workflow_data
-from controllers.lavague_controller import run_lavague_workflow  # Import the new function
+from typing import Iterator
+from core.jobs import Job, JobQueue, SUCCEEDED, FAILED
+from core.metrics import collect_timings, span, render_metrics
+from core.debug import debug_dump
+from core.ingest import receive_video_upload, link_or_reference, UploadError, UPLOAD_DIR
+from core.store import get_workflow_store, video_hash
+
+# Heavy modules (NumPy, ffmpeg, the OpenAI SDK, LaVague/Selenium) are imported on first use
+register_module("fingerprint", "core.fingerprint")
+register_module("video", "controllers.video_controller",
+                warm=lambda video: video.get_media_pool(), close=lambda video: video.shutdown_media_pool())
+register_module("openai", "core.openai_client",
+                warm=lambda openai: (openai.get_openai_client(), openai.get_async_openai_client()))
+register_module("driver_pool", "controllers.driver_pool",
+                warm=lambda pool: pool.get_driver_pool().warm(), close=lambda pool: pool.close_driver_pool())
+register_module("lavague", "controllers.lavague_controller", requires=["driver_pool"])
+
+# Components to load and warm in the background once the app is up (e.g. "driver_pool,openai")
+WARM_ON_STARTUP = [name.strip() for name in os.getenv("PEAR_WARM_ON_STARTUP", "").split(",") if name.strip()]
 
 app = FastAPI()
 
@@ -12,97 +35,409 @@ app = FastAPI()
 async def root():
     return {"message": "Welcome to the Workflow Creation API"}
 
-@app.post("/create_new_workflow")
-async def create_new_workflow(workflow_data: dict):
-    print("\n--- Starting new workflow creation ---\n")
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
-    video_filename = workflow_data.get("video_filename", "input.mp4")
-    data_dir = Path("data")
-    video_path = data_dir / video_filename
+WORKFLOW_STAGES = ["link_video", "extract_media", "fingerprint", "group_images", "transcribe", "combine", "store"]
 
-    if not video_path.exists():
-        raise HTTPException(status_code=404, detail="Video file not found")
+job_queue = JobQueue()
+
+@app.on_event("startup")
+def report_startup():
+    providers.mark_started()
+    if WARM_ON_STARTUP:
+        # Warm in the background so startup is not blocked on Chrome or slow imports
+        threading.Thread(target=providers.warm_components, args=(WARM_ON_STARTUP,), daemon=True).start()
 
+@app.on_event("shutdown")
+def shutdown_job_queue():
+    job_queue.shutdown()
+    providers.close_components()
+
+@app.get("/ready")
+def ready(response: Response, warm: str = ""):
+    """
+    Reports startup time and which components are loaded. Pass warm as a comma-separated
+    list of components (or "all") to load and warm them first; responds 503 if any fail.
+    """
+    names = providers.component_names() if warm == "all" else [name.strip() for name in warm.split(",") if name.strip()]
+    statuses = providers.warm_components(names) if names else {}
+    failed = sorted(name for name, status in statuses.items() if "error" in status)
+    if failed:
+        response.status_code = 503
+    report = providers.startup_report()
+    report["ready"] = not failed
+    if failed:
+        report["failed"] = failed
+    return report
+
+def _interval(interval) -> dict:
+    start, end = interval
+    return {"start": start, "end": end}
+
+def workflow_events(job: Job, video_path: Path, video_filename: str, video_hash: str,
+                    include_timings: bool = False, incremental: bool = None) -> Iterator[dict]:
+    """
+    Runs the video-to-workflow pipeline, yielding partial results as they become ready:
+
+    - a "screen" event (interval and summary) for each screen as soon as it is summarized
+    - a "transcription" event per screen, in time order, once the audio is transcribed
+    - a "step" event per stored workflow step, in time order
+    - finally a "result" event carrying the same result build_workflow() returns
+
+    With incremental set (by default, PEAR_INCREMENTAL), steps that are unchanged from an
+    earlier version of the recording are spliced in, and only the rest of the video is
+    grouped and transcribed.
+    """
     print(f"Processing video: {video_filename}")
+    video = get_component("video")
+    fingerprints = get_component("fingerprint")
+    if incremental is None:
+        incremental = fingerprints.INCREMENTAL_REPROCESSING
 
     # Create a temporary directory
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with collect_timings() as timings, tempfile.TemporaryDirectory() as temp_dir:
         print(f"\nCreated temporary directory: {temp_dir}")
 
-        # Copy the video to the temp directory
-        temp_video_path = os.path.join(temp_dir, video_filename)
-        with open(video_path, "rb") as src_file, open(temp_video_path, "wb") as dst_file:
-            dst_file.write(src_file.read())
-        
-        print(f"Copied video to: {temp_video_path}")
+        # Link the video into the temp directory instead of copying it
+        job.set_stage("link_video")
+        local_filename = os.path.basename(video_filename)
+        temp_video_path = link_or_reference(video_path, os.path.join(temp_dir, local_filename))
+        print(f"Using video at: {temp_video_path}")
 
-        # Extract audio
-        audio_path = os.path.join(temp_dir, f"{video_filename}.mp3")
-        extract_audio(temp_video_path, audio_path)
-        print(f"Extracted audio to: {audio_path}")
-        
-        # Extract screenshots
+        # Extract screenshots and audio in a single decode, and fingerprint them, in the media process pool
+        job.set_stage("extract_media")
+        audio_path = os.path.join(temp_dir, f"{local_filename}.mp3")
         screenshots_dir = os.path.join(temp_dir, "screenshots")
-        os.makedirs(screenshots_dir, exist_ok=True)
-        extract_screenshots(temp_video_path, screenshots_dir)
+        with span("extract_media"):
+            media = video.process_media(temp_video_path, screenshots_dir, audio_path)
+        print(f"Extracted audio to: {audio_path}")
         print(f"Extracted screenshots to: {screenshots_dir}")
 
-        # Group images
-        screenshot_paths = [os.path.join(screenshots_dir, f) for f in os.listdir(screenshots_dir) if f.endswith('.png')]
-        screenshot_info = group_images(screenshot_paths)
-        print("\n--- Screenshot grouping results ---")
-        print(json.dumps(screenshot_info, indent=2))
+        # Diff the fingerprints against earlier recordings
+        job.set_stage("fingerprint")
+        frames = media["frames"]
+        fingerprint = media["fingerprint"]
+        store = get_workflow_store()
+        with span("fingerprint") as attributes:
+            reused_steps, reused_words, cut = [], [], 0.0
+            if incremental:
+                reused_steps, reused_words, cut = fingerprints.find_reusable_work(store, video_hash, fingerprint)
+            # The first frame after the cut can be sampled a moment before it
+            new_frames = {path: t for path, t in frames.items() if t >= cut - fingerprints.FRAME_TIME_TOLERANCE}
+            if not new_frames:
+                reused_steps, reused_words, cut, new_frames = [], [], 0.0, frames
+            attributes["reused_steps"] = len(reused_steps)
+            attributes["reprocess_from"] = cut
 
-        # Process video to get audio clips
-        audio_clips_dir = os.path.join(temp_dir, "audio_clips")
-        os.makedirs(audio_clips_dir, exist_ok=True)
-        audio_file_map = process_video(temp_video_path, screenshot_info)
-        print("\n--- Audio file mapping ---")
-        print(json.dumps({k: v for k, v in audio_file_map.items()}, indent=2))
+        # Group images, passing each screen on as soon as its summary is ready
+        job.set_stage("group_images")
+        with span("group_images", frames=len(new_frames)) as attributes:
+            screens = []
+            for step in reused_steps:
+                screens.append((step["screenshot"], {
+                    "interval": (step["interval"]["start"], step["interval"]["end"]),
+                    "summary": step["summary"]
+                }))
+                yield {"event": "screen", "interval": step["interval"], "summary": step["summary"], "reused": True}
+            for screenshot, info in video.iter_screens(list(new_frames), timestamps=new_frames, duration=media["duration"]):
+                screens.append((screenshot, info))
+                yield {"event": "screen", "interval": _interval(info["interval"]), "summary": info["summary"]}
+            screenshot_info = dict(sorted(screens, key=lambda screen: screen[1]["interval"][0]))
+            attributes["screens"] = len(screenshot_info)
+        debug_dump("Screenshot grouping results", screenshot_info)
 
-        # Transcribe audio clips
-        transcriptions = transcribe_audio_files(audio_file_map)
-        print("\n--- Transcription results ---")
-        print(json.dumps({k: v for k, v in transcriptions.items()}, indent=2))
+        # Transcribe the audio once (from the cut, if reusing earlier work) and split it across the screens
+        job.set_stage("transcribe")
+        with span("transcribe_audio", start=cut):
+            # Reuse the samples and speech segments the media stage already decoded
+            samples = video.load_samples(media["samples_path"]) if "samples_path" in media else None
+            new_words = video.transcribe_audio(audio_path, start=cut, samples=samples, segments=media.get("speech"))
+            words = reused_words + [w for w in new_words if (w["start"] + w["end"]) / 2 >= cut]
+        with span("align_transcription", words=len(words)):
+            transcriptions = video.align_transcription(words, screenshot_info)
+        debug_dump("Transcription results", transcriptions)
+        for index, info in enumerate(screenshot_info.values()):
+            start, end = info["interval"]
+            yield {"event": "transcription", "index": index, "interval": _interval(info["interval"]),
+                   "transcription": transcriptions.get(f"{start}-{end}", "")}
 
         # Combine all the data
-        combined_workflow_data = combine_workflow_data(screenshot_info, transcriptions)
-        print("\n--- Combined workflow data ---")
-        print(json.dumps(combined_workflow_data, indent=2))
+        job.set_stage("combine")
+        with span("combine_workflow_data"):
+            workflow = video.combine_workflow_data(screenshot_info, transcriptions)
+        debug_dump("Combined workflow data", workflow.to_workflow_data())
+
+        # Save before the temp directory (and its screenshots) goes away
+        job.set_stage("store")
+        with span("store_workflow"):
+            stored = store.save_workflow(video_hash, workflow, words, video_filename)
+            store.save_fingerprint(video_hash, fingerprint)
+        for index, step in enumerate(stored["workflow_data"]):
+            yield {"event": "step", "index": index, "step": step}
 
         print("\n--- Workflow creation completed ---\n")
 
-        return {
+        result = {
             "status": "Success",
+            "workflow_id": stored["workflow_id"],
             "video_filename": video_filename,
-            "workflow_data": combined_workflow_data
+            "workflow_data": stored["workflow_data"],
+            "reused_steps": len(reused_steps)
         }
+        if include_timings:
+            result["timings"] = timings
+        yield {"event": "result", "result": result}
+
+def build_workflow(job: Job, video_path: Path, video_filename: str, video_hash: str,
+                   include_timings: bool = False, incremental: bool = None) -> dict:
+    """
+    Runs the video-to-workflow pipeline inside a background job and stores the result
+    under the video's content hash. Partial results are passed to job.emit() on the way.
+    """
+    result = None
+    for event in workflow_events(job, video_path, video_filename, video_hash, include_timings, incremental):
+        if event["event"] == "result":
+            result = event["result"]
+        else:
+            job.emit(event)
+    return result
+
+@app.post("/upload_video", status_code=201)
+async def upload_video(request: Request):
+    """
+    Streams a multipart upload (form field "file") to disk under its content hash.
+
+    The returned video_filename can be passed straight to /create_new_workflow.
+    """
+    try:
+        upload = await receive_video_upload(request)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    print(f"Stored upload {upload['original_filename']} ({upload['size']} bytes) at {upload['video_path']}")
+
+    return {
+        "status": "Success",
+        "video_filename": str(upload["video_path"].relative_to(UPLOAD_DIR.parent)),
+        "video_hash": upload["video_hash"],
+        "size": upload["size"]
+    }
+
+async def start_workflow(video_filename: str, include_timings: bool = False, force: bool = False,
+                         stream: bool = False):
+    """
+    Returns (stored_response, None) if this video has been processed before, otherwise
+    queues a build and returns (None, job). Raises 404 if the video does not exist.
+
+    With stream set, the job keeps its partial results for Job.events().
+    """
+    video_path = Path("data") / video_filename
+    if not video_path.exists():
+        raise HTTPException(status_code=404, detail="Video file not found")
+
+    content_hash = await asyncio.to_thread(video_hash, str(video_path))
+    if not force:
+        stored = await asyncio.to_thread(get_workflow_store().find_workflow, content_hash)
+        if stored is not None:
+            print(f"Returning stored workflow {stored['workflow_id']} for {video_filename}")
+            return {
+                "status": "Success",
+                "workflow_id": stored["workflow_id"],
+                "video_filename": video_filename,
+                "workflow_data": stored["workflow_data"],
+                "stored": True
+            }, None
+
+    # None leaves it to PEAR_INCREMENTAL; a forced rebuild reprocesses everything
+    incremental = False if force else None
+    job = job_queue.submit(build_workflow, video_path, video_filename, content_hash, include_timings, incremental,
+                           stages=WORKFLOW_STAGES, stream_events=stream)
+    print(f"Queued workflow creation job {job.id} for {video_filename}")
+    return None, job
+
+def format_event(event: dict, sse: bool = False) -> str:
+    """Formats a workflow event as one NDJSON line, or as a Server-Sent Event."""
+    if sse:
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+async def stream_workflow(video_filename: str, stored: dict, job: Job, sse: bool = False):
+    """
+    Streams a workflow build's events as they are produced, ending with a "done" event
+    (the result without its steps, which were already sent) or an "error" event.
+    A stored workflow is streamed as its steps followed by "done".
+    """
+    if stored is not None:
+        for index, step in enumerate(stored["workflow_data"]):
+            yield format_event({"event": "step", "index": index, "step": step}, sse)
+        yield format_event({"event": "done", **{k: v for k, v in stored.items() if k != "workflow_data"}}, sse)
+        return
+
+    yield format_event({"event": "queued", "job_id": job.id, "video_filename": video_filename}, sse)
+    async for event in job.events_async():
+        yield format_event(event, sse)
+
+    if job.status == SUCCEEDED:
+        yield format_event({"event": "done", **{k: v for k, v in job.result.items() if k != "workflow_data"}}, sse)
+    else:
+        yield format_event({"event": "error", "status": job.status.capitalize(), "job_id": job.id,
+                            "video_filename": video_filename, "error": job.error}, sse)
+
+@app.post("/create_new_workflow", status_code=202)
+async def create_new_workflow(workflow_data: dict, request: Request, response: Response):
+    """
+    Queues a workflow build for the video, or returns the stored workflow straight
+    away if this video has been processed before (pass "force": true to rebuild).
+
+    Pass "stream": true to get the build's progress as NDJSON instead, each screen's
+    summary as soon as it is ready, then the transcriptions and stored steps (see
+    workflow_events). Clients sending Accept: text/event-stream get Server-Sent Events.
+    """
+    print("\n--- Starting new workflow creation ---\n")
+
+    video_filename = workflow_data.get("video_filename", "input.mp4")
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    stream = sse or bool(workflow_data.get("stream", False))
+    stored, job = await start_workflow(
+        video_filename,
+        include_timings=bool(workflow_data.get("include_timings", False)),
+        force=bool(workflow_data.get("force", False)),
+        stream=stream
+    )
+    if stream:
+        return StreamingResponse(stream_workflow(video_filename, stored, job, sse),
+                                 media_type="text/event-stream" if sse else "application/x-ndjson")
+
+    if stored is not None:
+        response.status_code = 200
+        return stored
+
+    return {
+        "status": "Queued",
+        "job_id": job.id,
+        "video_filename": video_filename
+    }
+
+async def wait_for_job(video_filename: str, job: Job) -> dict:
+    """Waits for a queued workflow job and returns its outcome as one batch result line."""
+    try:
+        await asyncio.wrap_future(job.future)
+    except asyncio.CancelledError:
+        pass
+    if job.status == SUCCEEDED:
+        return job.result
+    return {"status": job.status.capitalize(), "job_id": job.id, "video_filename": video_filename, "error": job.error}
+
+@app.post("/create_workflows")
+async def create_workflows(batch: dict):
+    """
+    Queues workflow builds for a list of videos ("video_filenames") and streams one
+    NDJSON line per video as each finishes. Stored workflows and missing files are
+    reported first.
+
+    All builds share the media process pool and the process-wide OpenAI rate limit.
+    """
+    video_filenames = batch.get("video_filenames")
+    if not isinstance(video_filenames, list) or not video_filenames:
+        raise HTTPException(status_code=400, detail="video_filenames must be a non-empty list")
+    include_timings = bool(batch.get("include_timings", False))
+    force = bool(batch.get("force", False))
+    print(f"\n--- Starting batch workflow creation for {len(video_filenames)} videos ---\n")
+
+    async def results():
+        pending = []
+        for video_filename in dict.fromkeys(video_filenames):
+            try:
+                stored, job = await start_workflow(video_filename, include_timings, force)
+            except HTTPException as e:
+                yield json.dumps({"status": "NotFound", "video_filename": video_filename, "error": e.detail}) + "\n"
+                continue
+            if stored is not None:
+                yield json.dumps(stored) + "\n"
+            else:
+                pending.append(wait_for_job(video_filename, job))
+
+        for finished in asyncio.as_completed(pending):
+            yield json.dumps(await finished) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict(include_result=job.status == SUCCEEDED)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=f"Job failed: {job.error}")
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.result
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.cancel():
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job.to_dict()
+
+@app.get("/workflows/{workflow_id}")
+def get_workflow(workflow_id: str):
+    stored = get_workflow_store().get_workflow(workflow_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    return stored
 
 @app.post("/run_workflow")
-async def execute_lavague_workflow(workflow_data: dict):
+def execute_lavague_workflow(workflow_data: dict):
+    """
+    Runs the agent on a trace, given either inline as "trace" or by the "workflow_id"
+    of a stored workflow.
+    """
     print("\n--- Starting La Vague workflow execution ---\n")
 
     trace = workflow_data.get("trace")
     hint = workflow_data.get("hint")
     url = workflow_data.get("url")
 
+    workflow_id = workflow_data.get("workflow_id")
+    if not trace and workflow_id:
+        stored = get_workflow_store().get_workflow(workflow_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="Workflow not found")
+        trace = stored["workflow_data"]
+
     if not trace or not hint or not url:
-        raise HTTPException(status_code=400, detail="Missing required parameters: trace, hint, or url")
+        raise HTTPException(status_code=400, detail="Missing required parameters: trace (or workflow_id), hint, or url")
 
     try:
         # Convert trace to string if it's not already
-        if isinstance(trace, dict):
+        if isinstance(trace, (dict, list)):
             trace = json.dumps(trace)
         
         # Run the La Vague workflow
-        result = run_lavague_workflow(trace, hint, url)
+        with collect_timings() as timings:
+            result = get_component("lavague").run_lavague_workflow(trace, hint, url)
         
         print("\n--- La Vague workflow execution completed ---\n")
 
-        return {
+        response = {
             "status": "Success",
             "workflow_result": result
         }
+        if workflow_data.get("include_timings"):
+            response["timings"] = timings
+        return response
     except Exception as e:
         print(f"Error during La Vague workflow execution: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error during workflow execution: {str(e)}")
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app's modules the same way main.py does, from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def fake_openai(tmp_path, monkeypatch):
+    """
+    Points the process-wide OpenAI clients at a local fake server, with a fresh result
+    cache and workflow store under tmp_path.
+    """
+    from benchmarks.fake_openai import FakeOpenAIServer
+    import core.cache
+    import core.openai_client
+    import core.store
+    from core.rate_limit import TokenBucket
+
+    server = FakeOpenAIServer(latency=0, jitter=0).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(core.openai_client, "_client", None)
+    monkeypatch.setattr(core.openai_client, "_async_client", None)
+    monkeypatch.setattr(core.openai_client, "_limiter", TokenBucket(1000, 1000))
+    monkeypatch.setattr(core.cache, "_cache", core.cache.ResultCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(core.store, "_store", core.store.SQLiteWorkflowStore(
+        str(tmp_path / "store.sqlite3"), str(tmp_path / "frames")))
+    yield server
+    server.stop()
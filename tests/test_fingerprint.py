@@ -0,0 +1,121 @@
+import pytest
+
+from core.fingerprint import (AUDIO_WINDOW_SECONDS, FRAME_TIME_TOLERANCE, find_base, find_reusable_work,
+                              reusable_steps, unchanged_prefix)
+
+BUCKETS_PER_WINDOW = int(round(AUDIO_WINDOW_SECONDS / 0.25))
+
+def frame_hash(value: int) -> str:
+    """A 256-bit hash whose bytes are all value; different values differ in far more bits than the tolerance."""
+    return bytes([value] * 32).hex()
+
+def envelope(level: float, buckets: int = BUCKETS_PER_WINDOW):
+    return [level] * buckets
+
+def fingerprint(frame_values, audio_levels, frame_step: float = 1.0, offset: float = 0.0):
+    """One frame per frame_step seconds and one audio window per level."""
+    return {
+        "duration": len(frame_values) * frame_step,
+        "frames": [(round(i * frame_step + offset, 3), frame_hash(value)) for i, value in enumerate(frame_values)],
+        "audio_window": AUDIO_WINDOW_SECONDS,
+        "audio": [envelope(level) for level in audio_levels]
+    }
+
+# Ten seconds of recording: a frame every second and two 5s audio windows
+ORIGINAL = fingerprint([1, 1, 1, 2, 2, 2, 3, 3, 3, 3], [-20, -30])
+
+def test_appended_recording_matches_whole_original():
+    appended = fingerprint([1, 1, 1, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4, 4], [-20, -30, -40])
+    assert unchanged_prefix(appended, ORIGINAL) == 10.0
+
+def test_edited_ending_matches_up_to_first_change():
+    # Frames change at 6s, and the audio window covering 5-10s changes too
+    edited = fingerprint([1, 1, 1, 2, 2, 2, 5, 5, 5, 5], [-20, -45])
+    assert unchanged_prefix(edited, ORIGINAL) == 5.0
+
+    # With the audio unchanged, the first changed frame decides
+    edited_frames = fingerprint([1, 1, 1, 2, 2, 2, 5, 5, 5, 5], [-20, -30])
+    assert unchanged_prefix(edited_frames, ORIGINAL) == 6.0
+
+def test_unrelated_recording_has_no_base():
+    unrelated = fingerprint([7, 7, 8, 8, 9, 9, 9, 9, 9, 9], [-60, -10])
+    assert unchanged_prefix(unrelated, ORIGINAL) == 0.0
+    assert find_base(unrelated, [("original", ORIGINAL)]) is None
+
+def test_shorter_re_recording_matches_its_own_length():
+    # Re-recorded, stopping after six seconds: the second audio window is only partly there
+    shorter = fingerprint([1, 1, 1, 2, 2, 2], [-20, -30])
+    shorter["audio"][1] = envelope(-30, BUCKETS_PER_WINDOW // 5)
+    assert unchanged_prefix(shorter, ORIGINAL) == 5.0
+
+def test_frame_times_within_tolerance_still_match():
+    shifted = fingerprint([1, 1, 1, 2, 2, 2, 3, 3, 3, 3], [-20, -30], offset=FRAME_TIME_TOLERANCE / 2)
+    assert unchanged_prefix(shifted, ORIGINAL) == 9.0 + FRAME_TIME_TOLERANCE / 2
+
+    late = fingerprint([1, 1, 1, 2, 2, 2, 3, 3, 3, 3], [-20, -30], offset=FRAME_TIME_TOLERANCE * 2)
+    assert unchanged_prefix(late, ORIGINAL) == 0.0
+
+def test_different_audio_windows_never_match():
+    other_window = dict(ORIGINAL, audio_window=AUDIO_WINDOW_SECONDS * 2)
+    assert unchanged_prefix(other_window, ORIGINAL) == 0.0
+
+def test_find_base_picks_longest_prefix():
+    appended = fingerprint([1, 1, 1, 2, 2, 2, 3, 3, 3, 3, 4, 4], [-20, -30, -40])
+    edited = fingerprint([1, 1, 1, 2, 2, 2, 5, 5, 5, 5], [-20, -45])
+    assert find_base(appended, [("edited", edited), ("original", ORIGINAL)]) == ("original", 10.0)
+
+def step(start: float, end: float, summary: str = ""):
+    return {"screenshot": f"step{start}.png", "interval": {"start": start, "end": end}, "summary": summary}
+
+STEPS = [step(0.0, 3.0, "a"), step(3.0, 6.0, "b"), step(6.0, 10.0, "c")]
+
+def test_reusable_steps_stop_at_prefix_and_drop_last_step():
+    assert reusable_steps(STEPS, 6.0) == STEPS[:2]
+    assert reusable_steps(STEPS, 5.0) == STEPS[:1]
+    # Even when the whole recording is unchanged, its final step may continue in the new one
+    assert reusable_steps(STEPS, 10.0) == STEPS[:2]
+    assert reusable_steps(STEPS, 2.0) == []
+
+class FakeStore:
+    def __init__(self, fingerprints, workflows, transcripts):
+        self.fingerprints = fingerprints
+        self.workflows = workflows
+        self.transcripts = transcripts
+
+    def recent_fingerprints(self, limit: int = 20):
+        return list(self.fingerprints.items())[:limit]
+
+    def find_workflow(self, video_hash: str):
+        return self.workflows.get(video_hash)
+
+    def get_transcript(self, video_hash: str):
+        return self.transcripts.get(video_hash)
+
+WORDS = [
+    {"word": "one", "start": 0.5, "end": 1.0},
+    {"word": "two", "start": 5.5, "end": 6.0},
+    # Straddles the cut at 6s, with its midpoint after it
+    {"word": "three", "start": 5.9, "end": 6.3},
+    {"word": "four", "start": 8.0, "end": 8.5},
+]
+
+def make_store():
+    return FakeStore({"original": ORIGINAL}, {"original": {"workflow_data": STEPS}}, {"original": WORDS})
+
+def test_find_reusable_work_splices_steps_and_words_before_cut():
+    appended = fingerprint([1, 1, 1, 2, 2, 2, 3, 3, 3, 3, 4, 4], [-20, -30, -40])
+    steps, words, cut = find_reusable_work(make_store(), "appended", appended)
+    assert steps == STEPS[:2]
+    assert cut == 6.0
+    assert [w["word"] for w in words] == ["one", "two"]
+
+def test_find_reusable_work_ignores_the_same_video():
+    steps, words, cut = find_reusable_work(make_store(), "original", ORIGINAL)
+    assert (steps, words, cut) == ([], [], 0.0)
+
+@pytest.mark.parametrize("missing", ["workflows", "transcripts"])
+def test_find_reusable_work_needs_stored_workflow_and_transcript(missing):
+    store = make_store()
+    setattr(store, missing, {})
+    appended = fingerprint([1, 1, 1, 2, 2, 2, 3, 3, 3, 3, 4, 4], [-20, -30, -40])
+    assert find_reusable_work(store, "appended", appended) == ([], [], 0.0)
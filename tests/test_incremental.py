@@ -0,0 +1,63 @@
+import shutil
+
+import pytest
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+def build(main, video_path, incremental=True):
+    from core.jobs import Job
+    from core.store import video_hash
+    job = Job("test", main.WORKFLOW_STAGES)
+    return main.build_workflow(job, video_path, video_path.name, video_hash(str(video_path)), incremental=incremental)
+
+def test_appended_recording_reuses_earlier_steps(fake_openai, tmp_path, monkeypatch):
+    from benchmarks.run_benchmarks import generate_video
+    import controllers.video_controller
+    import main
+
+    # Decode in this process; the spawned media pool would re-import the test runner
+    monkeypatch.setattr(controllers.video_controller, "MEDIA_WORKERS", 0)
+
+    # The same seed renders the same screens, so the longer video extends the shorter one
+    original_path, appended_path = tmp_path / "original.mp4", tmp_path / "appended.mp4"
+    generate_video(original_path, 20, 5)
+    generate_video(appended_path, 35, 5)
+
+    original = build(main, original_path)
+    assert original["reused_steps"] == 0
+    assert len(original["workflow_data"]) == 4
+
+    fake_openai.reset_counters()
+    appended = build(main, appended_path)
+    calls = fake_openai.counters()["calls"]
+
+    # The original's last step is reprocessed, since its screen continues in the new recording
+    assert appended["reused_steps"] == 3
+    steps = appended["workflow_data"]
+    assert [(s["interval"]["start"], s["interval"]["end"]) for s in steps] == [
+        (0.0, 5.0), (5.0, 10.0), (10.0, 15.0), (15.0, 20.0), (20.0, 25.0), (25.0, 30.0), (30.0, 35.0)
+    ]
+    assert [s["summary"] for s in steps[:3]] == [s["summary"] for s in original["workflow_data"][:3]]
+    assert [s["transcription"] for s in steps[:3]] == [s["transcription"] for s in original["workflow_data"][:3]]
+
+    # Only the screens after the cut are summarized, and only the audio after it is transcribed.
+    # The fake transcript restarts at word0, so shifted words land in the step starting at the cut
+    assert calls.get("chat.completions", 0) <= len(steps) - 3
+    assert calls["audio.transcriptions"] == 1
+    assert steps[3]["transcription"].startswith("word0 ")
+    assert all(s["transcription"] for s in steps)
+
+def test_full_rebuild_when_incremental_is_off(fake_openai, tmp_path, monkeypatch):
+    from benchmarks.run_benchmarks import generate_video
+    import controllers.video_controller
+    import main
+
+    monkeypatch.setattr(controllers.video_controller, "MEDIA_WORKERS", 0)
+    original_path, appended_path = tmp_path / "original.mp4", tmp_path / "appended.mp4"
+    generate_video(original_path, 20, 5)
+    generate_video(appended_path, 30, 5)
+
+    build(main, original_path)
+    rebuilt = build(main, appended_path, incremental=False)
+    assert rebuilt["reused_steps"] == 0
+    assert len(rebuilt["workflow_data"]) == 6
@@ -0,0 +1,72 @@
+import asyncio
+import hashlib
+
+import pytest
+from starlette.requests import ClientDisconnect, Request
+
+from core.ingest import UploadError, receive_video_upload
+
+BOUNDARY = "----pearboundary"
+VIDEO = bytes(range(256)) * 64
+
+def multipart_body(*parts):
+    """Builds a multipart/form-data body from (name, filename, content) parts."""
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n"
+                 f"Content-Type: application/octet-stream\r\n\r\n").encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+def upload(chunks, disconnect=False, upload_dir=None):
+    """Feeds the body to receive_video_upload in the given chunks, as the ASGI server would."""
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages.append({"type": "http.disconnect"} if disconnect else {"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {"type": "http", "method": "POST", "path": "/upload_video",
+             "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]}
+    return asyncio.run(receive_video_upload(Request(scope, receive), upload_dir=upload_dir))
+
+def split(body, *positions):
+    edges = [0, *positions, len(body)]
+    return [body[a:b] for a, b in zip(edges, edges[1:])]
+
+def test_boundary_split_across_chunks(tmp_path):
+    body = multipart_body(("file", "screen.MP4", VIDEO))
+    # Cut inside the closing boundary and inside the part headers
+    closing = body.rindex(BOUNDARY.encode())
+    result = upload(split(body, 20, 60, closing + 5), upload_dir=tmp_path)
+
+    assert result["size"] == len(VIDEO)
+    assert result["video_hash"] == hashlib.sha256(VIDEO).hexdigest()
+    assert result["video_path"] == tmp_path / f"{result['video_hash']}.mp4"
+    assert result["video_path"].read_bytes() == VIDEO
+    assert not list(tmp_path.glob("*.part"))
+
+def test_field_before_the_file_is_skipped(tmp_path):
+    body = multipart_body(("title", None, b"Quarterly report"), ("file", "screen.mp4", VIDEO))
+    result = upload([body], upload_dir=tmp_path)
+
+    assert result["original_filename"] == "screen.mp4"
+    assert result["video_path"].read_bytes() == VIDEO
+
+@pytest.mark.parametrize("cut", [30, 200, -10])
+def test_truncated_body_is_malformed(tmp_path, cut):
+    body = multipart_body(("file", "screen.mp4", VIDEO))
+    with pytest.raises(UploadError, match="Malformed multipart body"):
+        upload([body[:cut]], upload_dir=tmp_path)
+    assert not list(tmp_path.iterdir())
+
+def test_missing_file_field(tmp_path):
+    with pytest.raises(UploadError, match="No file found"):
+        upload([multipart_body(("title", None, b"no video"))], upload_dir=tmp_path)
+
+def test_client_disconnect_removes_partial_file(tmp_path):
+    body = multipart_body(("file", "screen.mp4", VIDEO))
+    with pytest.raises(ClientDisconnect):
+        upload(split(body, 200, 4000), disconnect=True, upload_dir=tmp_path)
+    assert not list(tmp_path.glob("*.part"))
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,79 @@
+import asyncio
+import importlib
+import threading
+
+import core.config
+import core.jobs
+from core.jobs import JobQueue, SUCCEEDED
+
+def reload_jobs(monkeypatch, **env):
+    for name in ("PEAR_JOB_WORKERS", "PEAR_MEDIA_WORKERS"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    importlib.reload(core.config)
+    return importlib.reload(core.jobs).JOB_WORKERS
+
+def test_job_workers_follow_media_workers(monkeypatch):
+    try:
+        assert reload_jobs(monkeypatch, PEAR_MEDIA_WORKERS="6") == 6
+        assert reload_jobs(monkeypatch, PEAR_MEDIA_WORKERS="1") == 2
+        assert reload_jobs(monkeypatch, PEAR_MEDIA_WORKERS="6", PEAR_JOB_WORKERS="3") == 3
+    finally:
+        monkeypatch.undo()
+        importlib.reload(core.config)
+        importlib.reload(core.jobs)
+
+def test_jobs_run_concurrently_up_to_max_workers():
+    workers = 4
+    queue = JobQueue(max_workers=workers)
+    barrier = threading.Barrier(workers, timeout=5)
+    try:
+        jobs = [queue.submit(lambda job: barrier.wait()) for _ in range(workers)]
+        for job in jobs:
+            job.future.result(timeout=10)
+        assert all(job.status == SUCCEEDED for job in jobs)
+    finally:
+        queue.shutdown()
+
+def test_events_async_streams_without_a_reader_thread():
+    queue = JobQueue(max_workers=1)
+    subscribed = threading.Event()
+
+    def work(job):
+        job.emit({"event": "early"})
+        subscribed.wait(5)
+        for i in range(3):
+            job.emit({"event": "step", "index": i})
+        return "done"
+
+    async def read(job):
+        threads = threading.active_count()
+        received = []
+        async for event in job.events_async():
+            received.append(event)
+            subscribed.set()
+            # Reading events does not park a thread per stream
+            assert threading.active_count() == threads
+        return received
+
+    try:
+        job = queue.submit(work, stream_events=True)
+        received = asyncio.run(read(job))
+        assert [e["event"] for e in received] == ["early", "step", "step", "step"]
+        assert job.future.result(timeout=5) is None and job.result == "done"
+    finally:
+        queue.shutdown()
+
+def test_prune_tolerates_a_job_that_is_still_finishing():
+    queue = JobQueue(max_workers=1, max_finished_jobs=1)
+    try:
+        done = [queue.submit(lambda job: None) for _ in range(2)]
+        for job in done:
+            job.future.result(timeout=5)
+        # A job another thread has marked finished but not yet timestamped
+        done[1].finished_at = None
+        queue.submit(lambda job: None).future.result(timeout=5)
+        assert sum(queue.get(job.id) is not None for job in done) == 1
+    finally:
+        queue.shutdown()
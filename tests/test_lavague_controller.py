@@ -0,0 +1,94 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+import controllers.lavague_controller as lavague
+
+class FakeRecorder:
+    def __init__(self, driver):
+        self.actions = [{"method": "get", "args": ["http://example.com/new"]}]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class FakePool:
+    def __init__(self, log):
+        self.log = log
+
+    @contextmanager
+    def driver(self):
+        self.log.append("checkout")
+        try:
+            yield SimpleNamespace(driver=None)
+        finally:
+            self.log.append("checkin")
+
+@pytest.fixture
+def workflow(monkeypatch):
+    """
+    Runs run_lavague_workflow with a stubbed browser pool, agent and LLM, returning the
+    result, the order things happened in and the recordings saved.
+    """
+    log, saved, recordings, prompts = [], [], {}, {}
+    monkeypatch.setattr(lavague, "ACTION_REPLAY_ENABLED", True)
+    monkeypatch.setattr(lavague, "get_recording", recordings.get)
+    monkeypatch.setattr(lavague, "get_recorded_prompt", prompts.get)
+
+    def save_recording(key, actions, lavague_prompt=None):
+        saved.append(actions)
+        recordings[key], prompts[key] = actions, lavague_prompt
+    monkeypatch.setattr(lavague, "save_recording", save_recording)
+    monkeypatch.setattr(lavague, "ActionRecorder", FakeRecorder)
+    monkeypatch.setattr(lavague, "replay_actions", lambda driver, actions: log.append("replay") or len(actions))
+    monkeypatch.setattr(lavague, "get_driver_pool", lambda: FakePool(log))
+
+    def generate_prompt_parts(trace, hint, session):
+        log.append("llm")
+        return "objective", "context"
+    monkeypatch.setattr(lavague, "generate_prompt_parts", generate_prompt_parts)
+
+    def run(agent_result):
+        def run_agent(*args, **kwargs):
+            log.append("agent")
+            if isinstance(agent_result, Exception):
+                raise agent_result
+            return agent_result
+        monkeypatch.setattr(lavague, "run_agent", run_agent)
+        log.clear()
+        result = lavague.run_lavague_workflow("[]", "hint", "http://example.com")
+        return result, list(log), saved
+    return run
+
+def test_prompt_is_built_before_a_browser_is_checked_out(workflow):
+    result, log, saved = workflow(SimpleNamespace(success=True))
+    assert result["status"] == "success"
+    assert log == ["llm", "checkout", "agent", "checkin"]
+    assert saved == [[{"method": "get", "args": ["http://example.com/new"]}]]
+
+def test_llm_failure_never_checks_out_a_browser(workflow, monkeypatch):
+    def failing_prompt(trace, hint, session):
+        raise TimeoutError("OpenAI timed out")
+    monkeypatch.setattr(lavague, "generate_prompt_parts", failing_prompt)
+
+    result, log, _ = workflow(SimpleNamespace(success=True))
+    assert result["status"] == "failed"
+    assert log == []
+
+def test_failed_run_is_not_recorded(workflow):
+    _, _, saved = workflow(SimpleNamespace(success=False))
+    assert saved == []
+
+def test_result_without_success_flag_is_recorded(workflow):
+    _, _, saved = workflow("done")
+    assert len(saved) == 1
+
+def test_repeat_run_replays_without_llm_calls(workflow):
+    workflow(SimpleNamespace(success=True))
+    result, log, _ = workflow(SimpleNamespace(success=True))
+    assert result["replayed"] is True
+    assert result["lavague_prompt"].startswith("CONTEXT: context")
+    assert log == ["checkout", "replay", "checkin"]
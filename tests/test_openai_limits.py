@@ -0,0 +1,65 @@
+import pytest
+
+import core.openai_client
+import core.rate_limit
+from core.rate_limit import TokenBucket
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(1000, 1000)
+        self.acquired = 0
+
+    def _reserve(self) -> float:
+        self.acquired += 1
+        return super()._reserve()
+
+@pytest.fixture
+def always_rate_limited(fake_openai, monkeypatch):
+    """Every request gets a 429; retries happen immediately and are capped at 2."""
+    fake_openai.error_rate = 1.0
+    limiter = CountingBucket()
+    monkeypatch.setattr(core.openai_client, "_limiter", limiter)
+    monkeypatch.setattr(core.rate_limit, "backoff_delay", lambda attempt, base_delay=1.0: 0.0)
+    return fake_openai, limiter
+
+def test_transcription_retries_each_take_a_token(always_rate_limited, tmp_path, monkeypatch):
+    from openai import RateLimitError
+    import controllers.video_controller as video
+
+    server, limiter = always_rate_limited
+    monkeypatch.setattr(video, "OPENAI_MAX_RETRIES", 2)
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"\0" * 4000)
+
+    with pytest.raises(RateLimitError):
+        video.transcribe_file(str(audio))
+    # One request per attempt, none retried inside the SDK
+    assert server.counters()["calls"]["audio.transcriptions"] == 3
+    assert limiter.acquired == 3
+
+def test_prompt_retries_each_take_a_token(always_rate_limited, monkeypatch):
+    from openai import RateLimitError
+    import controllers.lavague_controller as lavague
+
+    server, limiter = always_rate_limited
+    monkeypatch.setattr(lavague, "OPENAI_MAX_RETRIES", 2)
+
+    with pytest.raises(RateLimitError):
+        lavague.LLMSession(persistent_cache=False).call("prompt")
+    assert server.counters()["calls"]["chat.completions"] == 3
+    assert limiter.acquired == 3
+
+def test_summary_retries_each_take_a_token(always_rate_limited, tmp_path, monkeypatch):
+    from openai import RateLimitError
+    from PIL import Image
+    import controllers.video_controller as video
+
+    server, limiter = always_rate_limited
+    monkeypatch.setattr(video, "SUMMARY_MAX_RETRIES", 2)
+    frame = tmp_path / "frame.png"
+    Image.new("RGB", (64, 48), (200, 10, 10)).save(frame)
+
+    with pytest.raises(RateLimitError):
+        core.openai_client.run_async(video.summarize_images([str(frame)]))
+    assert server.counters()["calls"]["chat.completions"] == 3
+    assert limiter.acquired == 3
@@ -0,0 +1,56 @@
+import json
+
+from core.trace_compaction import compact_trace, estimate_tokens
+
+def sentences(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix} sentence number {i} describes a distinct action on screen." for i in range(count))
+
+def test_single_oversized_step_stays_valid_json():
+    trace = json.dumps({"workflow_data": [{
+        "interval": {"start": 0, "end": 30},
+        "summary": "Onepage" * 2000,
+        "transcription": "word " * 3000
+    }]})
+    compacted, stats = compact_trace(trace, token_budget=200)
+
+    data = json.loads(compacted)
+    step = data["workflow_data"][0]
+    assert step["interval"] == [0, 30]
+    assert step["summary"].startswith("Onepage")
+    assert step["transcription"].endswith("...")
+    assert stats["compacted_tokens"] <= 200
+
+def test_oversized_object_without_steps_stays_valid_json():
+    trace = json.dumps({"title": "Export report", "notes": sentences("note", 400)})
+    compacted, _ = compact_trace(trace, token_budget=100)
+
+    data = json.loads(compacted)
+    assert data["title"] == "Export report"
+    assert estimate_tokens(compacted) <= 100
+
+def test_many_steps_are_thinned_keeping_first_and_last():
+    steps = [{"summary": f"step{i} " + " ".join(f"w{i}x{j}" for j in range(60))} for i in range(40)]
+    compacted, _ = compact_trace(json.dumps(steps), token_budget=300)
+
+    data = json.loads(compacted)
+    assert 1 < len(data) < 40
+    assert data[0]["summary"].startswith("step0 ")
+    assert data[-1]["summary"].startswith("step39 ")
+
+def test_free_text_is_cut_to_the_budget():
+    compacted, _ = compact_trace(sentences("text", 500), token_budget=50)
+    assert estimate_tokens(compacted) <= 50
+
+def test_locators_are_kept_and_file_references_dropped(tmp_path):
+    screenshot = tmp_path / "screenshot0001.png"
+    screenshot.write_bytes(b"png")
+    trace = json.dumps({"actions": [
+        {"action": "click", "xpath": "//button[@id='new']", "url": "/new", "text": "Create",
+         "screenshot": "frames/0001.png", "image": str(screenshot), "thumbnail": "data:image/png;base64,AAAA"},
+        {"action": "type", "xpath": "/html/body/form/input[1]", "value": "Quarterly report"}
+    ]})
+    compacted, _ = compact_trace(trace)
+
+    first, second = json.loads(compacted)["actions"]
+    assert first == {"action": "click", "xpath": "//button[@id='new']", "url": "/new", "text": "Create"}
+    assert second["xpath"] == "/html/body/form/input[1]"
@@ -0,0 +1,80 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from core.vad import detect_speech, join_segments, remap_times, MIN_SPEECH_SECONDS, SPEECH_PADDING_SECONDS
+
+SAMPLE_RATE = 16000
+
+def signal(*parts):
+    """Builds audio from (kind, seconds) parts: "tone" is a loud 300 Hz tone, "quiet" faint noise."""
+    rng = np.random.default_rng(0)
+    pieces = []
+    for kind, seconds in parts:
+        count = int(seconds * SAMPLE_RATE)
+        if kind == "tone":
+            pieces.append(0.5 * np.sin(2 * np.pi * 300 * np.arange(count) / SAMPLE_RATE))
+        else:
+            pieces.append(rng.normal(0, 1e-4, count))
+    return np.concatenate(pieces).astype(np.float32)
+
+def test_detect_speech_finds_bursts_with_padding():
+    samples = signal(("quiet", 2), ("tone", 1), ("quiet", 3), ("tone", 2), ("quiet", 1))
+    segments = detect_speech(samples, SAMPLE_RATE)
+
+    assert len(segments) == 2
+    (first_start, first_end), (second_start, second_end) = segments
+    tolerance = 0.05
+    assert first_start == pytest.approx(2 - SPEECH_PADDING_SECONDS, abs=tolerance)
+    assert first_end == pytest.approx(3 + SPEECH_PADDING_SECONDS, abs=tolerance)
+    assert second_start == pytest.approx(6 - SPEECH_PADDING_SECONDS, abs=tolerance)
+    assert second_end == pytest.approx(8 + SPEECH_PADDING_SECONDS, abs=tolerance)
+
+def test_detect_speech_bridges_short_pauses_and_drops_clicks():
+    samples = signal(("quiet", 1), ("tone", 1), ("quiet", 0.2), ("tone", 1),
+                     ("quiet", 2), ("tone", MIN_SPEECH_SECONDS / 2), ("quiet", 2))
+    segments = detect_speech(samples, SAMPLE_RATE)
+
+    assert len(segments) == 1
+    assert segments[0][1] == pytest.approx(3.2 + SPEECH_PADDING_SECONDS, abs=0.05)
+
+def test_detect_speech_on_silence_and_empty_audio():
+    assert detect_speech(signal(("quiet", 3)), SAMPLE_RATE) == []
+    assert detect_speech(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE) == []
+    assert detect_speech(np.zeros(0, dtype=np.float32), SAMPLE_RATE) == []
+
+def test_remap_times_maps_joined_audio_back():
+    samples = signal(("quiet", 10), ("tone", 10))
+    segments = [(1.0, 2.0), (5.0, 7.0), (9.5, 10.0)]
+    joined, offsets = join_segments(samples, SAMPLE_RATE, segments)
+
+    # Segments followed by a 0.3s gap each: 0-1, 1.3-3.3, 3.6-4.1 in the joined audio
+    assert [joined_start for joined_start, _ in offsets] == pytest.approx([0.0, 1.3, 3.6])
+    assert len(joined) == pytest.approx(4.1 * SAMPLE_RATE, abs=2)
+    assert remap_times([0.0, 0.5, 1.3, 2.3, 3.6, 4.0], offsets) == pytest.approx([1.0, 1.5, 5.0, 6.0, 9.5, 9.9])
+
+def test_remap_times_without_segments_is_identity():
+    assert remap_times([0.5, 2.0], []) == [0.5, 2.0]
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_transcribe_audio_reuses_decoded_samples(fake_openai, tmp_path, monkeypatch):
+    import controllers.video_controller as video
+
+    samples = signal(("quiet", 4), ("tone", 2), ("quiet", 4))
+    audio_path = video.encode_audio(samples, str(tmp_path / "audio.mp3"))
+    segments = detect_speech(samples, SAMPLE_RATE)
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError("audio was decoded again")
+    monkeypatch.setattr(video, "decode_audio", no_decode)
+
+    words = video.transcribe_audio(audio_path, vad=True, samples=samples, segments=segments)
+    assert words
+    # Only the voiced part was uploaded, and the words land inside it on the original timeline
+    assert fake_openai.counters()["calls"]["audio.transcriptions"] == 1
+    assert all(segments[0][0] <= w["start"] <= segments[0][1] for w in words)
+
+    # From a start time past the speech, nothing is sent
+    assert video.transcribe_audio(audio_path, vad=True, start=7.0, samples=samples, segments=segments) == []
+    assert fake_openai.counters()["calls"]["audio.transcriptions"] == 1
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import core.workflow
+from core.workflow import Workflow
+
+def make_workflow(*intervals):
+    workflow = Workflow()
+    for index, (start, end) in enumerate(intervals):
+        workflow.add_node(f"shot{index}", start, end, None, f"summary {index}", transcription=f"words {index}")
+    return workflow
+
+def test_appended_nodes_are_linked_in_order():
+    workflow = make_workflow((0, 5), (5, 9), (9, 12), (12, 20))
+
+    assert len(workflow) == 4
+    assert [node.screenshot_id for node in workflow] == ["shot0", "shot1", "shot2", "shot3"]
+    assert [node.next_screenshot_id for node in workflow] == ["shot1", "shot2", "shot3", None]
+    assert workflow.head.screenshot_id == "shot0" and workflow.tail.screenshot_id == "shot3"
+    assert workflow.get("shot2").action_summary == "summary 2"
+    assert workflow.get("missing") is None
+
+def test_duplicate_screenshot_id_is_rejected():
+    workflow = make_workflow((0, 5))
+    with pytest.raises(ValueError):
+        workflow.add_node("shot0", 5, 9, None, "again")
+
+def test_step_at_boundaries():
+    workflow = make_workflow((0, 5), (5, 9))
+
+    assert workflow.step_at(0).screenshot_id == "shot0"
+    assert workflow.step_at(4.99).screenshot_id == "shot0"
+    # A shared boundary belongs to the step that starts there
+    assert workflow.step_at(5).screenshot_id == "shot1"
+    assert workflow.step_at(9).screenshot_id == "shot1"
+    assert workflow.step_at(9.01) is None
+    assert workflow.step_at(-1) is None
+
+def test_step_at_gap_and_out_of_order_insert():
+    workflow = make_workflow((10, 15), (2, 4))
+
+    assert workflow.step_at(3).screenshot_id == "shot1"
+    assert workflow.step_at(7) is None
+    assert workflow.step_at(12).screenshot_id == "shot0"
+
+def test_steps_between_returns_overlapping_steps():
+    workflow = make_workflow((0, 5), (5, 9), (9, 12), (12, 20))
+
+    assert [n.screenshot_id for n in workflow.steps_between(6, 10)] == ["shot1", "shot2"]
+    assert [n.screenshot_id for n in workflow.steps_between(4, 5)] == ["shot0", "shot1"]
+    assert [n.screenshot_id for n in workflow.steps_between(0, 100)] == ["shot0", "shot1", "shot2", "shot3"]
+    assert workflow.steps_between(21, 30) == []
+
+def test_workflow_data_round_trip():
+    workflow = make_workflow((0, 5), (5, 9))
+    workflow.get("shot1").video_url = "http://example.com/v.mp4"
+    data = workflow.to_workflow_data()
+
+    assert data[0] == {"screenshot": "shot0", "interval": {"start": 0, "end": 5},
+                       "summary": "summary 0", "transcription": "words 0"}
+    assert data[1]["video_url"] == "http://example.com/v.mp4"
+    assert Workflow.from_workflow_data(data).to_workflow_data() == data
+
+def test_json_round_trip():
+    workflow = make_workflow((0, 5.5), (5.5, 9))
+    restored = Workflow.from_json(workflow.to_json())
+
+    assert json.loads(workflow.to_json()) == workflow.to_workflow_data()
+    assert restored.to_workflow_data() == workflow.to_workflow_data()
+    assert restored.step_at(6).screenshot_id == "shot1"
+
+def test_msgpack_round_trip():
+    pytest.importorskip("msgpack")
+    workflow = make_workflow((0, 5), (5, 9))
+    assert Workflow.from_msgpack(workflow.to_msgpack()).to_workflow_data() == workflow.to_workflow_data()
+
+def test_msgpack_without_the_package(monkeypatch):
+    monkeypatch.setattr(core.workflow, "msgpack", None)
+    with pytest.raises(RuntimeError):
+        make_workflow((0, 5)).to_msgpack()